@@ -7,9 +7,14 @@ from io import BytesIO
 from frappe import _
 from datetime import datetime, timedelta
 from frappe.utils.file_manager import save_file
-from frappe.utils import getdate
 import csv
-import os
+import hashlib
+from werkzeug.http import http_date, parse_date
+from werkzeug.wrappers import Response
+from colorapp.member_numbers import allocate_member_numbers
+from colorapp.merchandise.doctype.merchandise_bin.merchandise_bin import get_bin_qty
+from colorapp.merchandise.stock_ledger import get_stock_versions, get_warehouse_balances
+from colorapp.merchandise.masters import get_item_masters
 
 @frappe.whitelist()
 def create_painters_meet_attendance(docname):
@@ -62,64 +67,32 @@ def create_painters_meet_attendance(docname):
 
 
 @frappe.whitelist()
-def upload_invitees(file_data, plan_name):
-    """Upload invitees from an Excel file and add them to the child table"""
+def upload_invitees(file_data=None, plan_name=None, file_url=None):
+    """Upload invitees from an Excel or CSV file and add them to the child table.
+    The file is read from an uploaded File by file_url, or from file_data sent with the request."""
     try:
-        # Convert the binary string to bytes (if necessary)
-        if isinstance(file_data, str):
-            file_data = file_data.encode('latin1')
-
-        # Read the Excel file from the binary data
-        file_content = BytesIO(file_data)
-        workbook = openpyxl.load_workbook(file_content)
-        sheet = workbook.active
-
         # Fetch the plan document
         plan_doc = frappe.get_doc('Painters Meet Plan', plan_name)
 
         # Get the current user (the uploader)
         current_user = frappe.session.user
 
-        # Loop through each row in the Excel sheet, skipping the header
-        for row in sheet.iter_rows(min_row=2, values_only=True):
-            # Read first_name, second_name, last_name, and mobile_number
-            mobile_number, first_name, second_name, last_name = (row + (None,) * 4)[:4]
-
-            # Ensure mobile number is provided
-            if not mobile_number:
-                frappe.throw(f"Mobile number is missing for the row: {row}")
-
-            # Convert the mobile number to string in case it's an integer
-            mobile_number = str(mobile_number)
-
-            # Ensure the mobile number starts with '0' if it's 9 digits long
-            if len(mobile_number) == 9 and not mobile_number.startswith('0'):
-                mobile_number = '0' + mobile_number
-
-            # Check if the member exists in Colour App Member by mobile_number
-            if not frappe.db.exists('Colour App Member', {'mobile_number': mobile_number}):
-                # Create new member if they don't exist
-                member = frappe.get_doc({
-                    'doctype': 'Colour App Member',
-                    'mobile_number': mobile_number,
-                    'first_name': first_name or '',  # Set empty if None
-                    'second_name': second_name or '',  # Set empty if None
-                    'last_name': last_name or None  # Last name might be absent
-                })
-                member.insert()
-                member_name = member.name
+        # Read the invitees, skipping the header
+        invitees = read_invitee_rows(iter_invitee_file_rows(file_data, file_url))
 
-                # Since this member does not have a tk_membership_number, create a ToDo
-                create_missing_tk_todo(member_name, mobile_number, first_name, second_name, current_user)
-            else:
-                # If the member exists, retrieve their name
-                member_name = frappe.get_value('Colour App Member', {'mobile_number': mobile_number}, 'name')
+        # Resolve all invitees to members, creating the missing ones in bulk
+        members = get_or_create_invitee_members(invitees, current_user)
 
-            # Add the member to the child table in Painters Meet Plan
-            plan_doc.append('painters_meet_invite', {
-                'colour_academy_member': member_name,
-                'mobile_number': mobile_number
-            })
+        # Add the members who are not invited yet to the child table in Painters Meet Plan
+        invited = {invite.colour_academy_member for invite in plan_doc.painters_meet_invite}
+        for mobile_number in invitees:
+            member_name = members[mobile_number]
+            if member_name not in invited:
+                plan_doc.append('painters_meet_invite', {
+                    'colour_academy_member': member_name,
+                    'mobile_number': mobile_number
+                })
+                invited.add(member_name)
 
         # Save the plan document with new invitees
         plan_doc.save()
@@ -131,40 +104,144 @@ def upload_invitees(file_data, plan_name):
         frappe.throw(f"Error uploading invitees: {str(e)}")
 
 
-def create_missing_tk_todo(member_name, mobile_number, first_name, second_name, assigned_to):
-    """Create a ToDo for a member missing tk_membership_number"""
+def iter_invitee_file_rows(file_data=None, file_url=None):
+    """Yield the rows of an invitee upload after the header, streaming the file instead of loading it whole.
+    CSV files are read with the csv module, Excel files with a read-only openpyxl workbook."""
+    if file_url:
+        # Read the uploaded file from disk
+        file_doc = frappe.get_doc('File', {'file_url': file_url})
+        file_doc.check_permission('read')
+        file_path = file_doc.get_full_path()
+
+        if file_path.lower().endswith('.csv'):
+            with open(file_path, newline='', encoding='utf-8-sig') as csv_file:
+                reader = csv.reader(csv_file)
+                next(reader, None)  # Skip the header
+                for row in reader:
+                    if any(row):
+                        yield tuple(value.strip() or None for value in row)
+            return
+
+        workbook = openpyxl.load_workbook(file_path, read_only=True, data_only=True)
+    else:
+        # Convert the binary string to bytes (if necessary)
+        if isinstance(file_data, str):
+            file_data = file_data.encode('latin1')
+
+        # Read the Excel file from the binary data
+        workbook = openpyxl.load_workbook(BytesIO(file_data), read_only=True, data_only=True)
+
+    try:
+        for row in workbook.active.iter_rows(min_row=2, values_only=True):
+            if any(value is not None for value in row):
+                yield row
+    finally:
+        workbook.close()
+
+
+def read_invitee_rows(rows):
+    """Read the invitee rows into {mobile_number: (first_name, second_name, last_name)}, keeping the first row per mobile number"""
+    invitees = {}
+    for row in rows:
+        # Read first_name, second_name, last_name, and mobile_number
+        mobile_number, first_name, second_name, last_name = (tuple(row) + (None,) * 4)[:4]
+
+        # Ensure mobile number is provided
+        if not mobile_number:
+            frappe.throw(f"Mobile number is missing for the row: {row}")
+
+        # Convert the mobile number to string in case it's an integer
+        mobile_number = str(mobile_number)
+
+        # Ensure the mobile number starts with '0' if it's 9 digits long
+        if len(mobile_number) == 9 and not mobile_number.startswith('0'):
+            mobile_number = '0' + mobile_number
+
+        invitees.setdefault(mobile_number, (first_name, second_name, last_name))
+
+    return invitees
+
+
+def get_or_create_invitee_members(invitees, current_user):
+    """Return {mobile_number: member} for the invitees, fetching existing members in one query and bulk creating the rest"""
+    members = {}
+    if not invitees:
+        return members
+
+    for member in frappe.get_all('Colour App Member',
+                                 filters={'mobile_number': ['in', list(invitees)]},
+                                 fields=['name', 'mobile_number']):
+        members.setdefault(member.mobile_number, member.name)
+
+    new_invitees = [mobile_number for mobile_number in invitees if mobile_number not in members]
+    if not new_invitees:
+        return members
+
+    # First and second names are mandatory for new members
+    for mobile_number in new_invitees:
+        first_name, second_name, last_name = invitees[mobile_number]
+        if not first_name or not second_name:
+            frappe.throw(f"First and second name are required to create the member with mobile number {mobile_number}")
+
+    timestamp = frappe.utils.now()
+    assignment = frappe.as_json([current_user])
+    values = []
+    for mobile_number, member_app_number in zip(new_invitees, allocate_member_numbers('Colour App Member', len(new_invitees))):
+        first_name, second_name, last_name = invitees[mobile_number]
+        member_name = " ".join(filter(None, [first_name, second_name, last_name]))
+        values.append([
+            member_app_number, timestamp, timestamp, current_user, current_user, 0, 0, assignment,
+            member_app_number, first_name, second_name, last_name or None, member_name, mobile_number, 'Painter'
+        ])
+        members[mobile_number] = member_app_number
+
+    frappe.db.bulk_insert('Colour App Member',
+                          ['name', 'creation', 'modified', 'owner', 'modified_by', 'docstatus', 'idx', '_assign',
+                           'member_app_number', 'first_name', 'second_name', 'last_name', 'member_name', 'mobile_number', 'membership_type'],
+                          values)
+
+    # New members do not have a tk_membership_number, create their ToDos in one batch
+    create_missing_tk_todos(
+        [(members[mobile_number], mobile_number, invitees[mobile_number][0], invitees[mobile_number][1]) for mobile_number in new_invitees],
+        current_user
+    )
+
+    return members
+
+
+def create_missing_tk_todos(new_members, assigned_to):
+    """Create the ToDos for members missing tk_membership_number in one insert, with a single notification to the uploader"""
     # Set the due date to 7 days from now
     due_date = (datetime.now() + timedelta(days=7)).date()
+    timestamp = frappe.utils.now()
 
-    # Create the ToDo record
-    todo = frappe.get_doc({
-        'doctype': 'ToDo',
-        'description': f'Please confirm the TK Membership Number for {first_name} {second_name} (Mobile: {mobile_number}) and update it in the system.',
-        'status': 'Open',
-        'owner': assigned_to,
-        'allocated_to': assigned_to,  # Assign task to uploader
-        'reference_type': 'Colour App Member',
-        'reference_name': member_name,
-        'priority': 'Medium',
-        'date': due_date
-    })
-    todo.insert()
+    values = []
+    for member_name, mobile_number, first_name, second_name in new_members:
+        values.append([
+            frappe.generate_hash(length=10), timestamp, timestamp, assigned_to, assigned_to, 0, 0,
+            f'Please confirm the TK Membership Number for {first_name} {second_name} (Mobile: {mobile_number}) and update it in the system.',
+            'Open', assigned_to, 'Colour App Member', member_name, 'Medium', due_date
+        ])
+
+    frappe.db.bulk_insert('ToDo',
+                          ['name', 'creation', 'modified', 'owner', 'modified_by', 'docstatus', 'idx',
+                           'description', 'status', 'allocated_to', 'reference_type', 'reference_name', 'priority', 'date'],
+                          values)
 
-    # Trigger Notification to appear under the bell icon
-    create_todo_notification(assigned_to, todo)
+    # Trigger one Notification to appear under the bell icon for the whole batch
+    create_todo_notification(assigned_to, len(values))
 
-    frappe.msgprint(f"ToDo created for {first_name} {second_name} to confirm TK Membership Number.")
+    frappe.msgprint(f"{len(values)} ToDos created to confirm the TK Membership Number of new members.")
 
-def create_todo_notification(assigned_to, todo):
+def create_todo_notification(assigned_to, todo_count):
     """Send a notification to the user under the notification bell"""
     # Create the notification log entry
     notification_doc = frappe.get_doc({
         'doctype': 'Notification Log',
         'for_user': assigned_to,
-        'subject': 'New ToDo Assigned',
-        'email_content': f'A new ToDo has been assigned to you: {todo.description}',
+        'subject': 'New ToDos Assigned',
+        'email_content': f'{todo_count} new ToDos have been assigned to you to confirm TK Membership Numbers.',
         'document_type': 'ToDo',
-        'document_name': todo.name,
     })
     notification_doc.insert()
 
@@ -172,7 +249,7 @@ def create_todo_notification(assigned_to, todo):
     frappe.publish_realtime(
         event='notification',
         user=assigned_to,
-        message='New ToDo Assigned'
+        message='New ToDos Assigned'
     )
 
 @frappe.whitelist()
@@ -220,20 +297,24 @@ def update_todo_status(doc, method):
 @frappe.whitelist()
 def update_dealer_invite_count_on_save(doc, method):
     """Update the invited_counter_staff field for each dealer in the dealers_meet_invite table on save."""
-    # Initialize a dictionary to count the number of counter staff for each dealer
+    # Counts only change when the counter staff or dealers invited change
+    if not (invite_table_changed(doc, 'counter_staff_meet_invite', 'counter_staff_name')
+            or invite_table_changed(doc, 'dealers_meet_invite', 'dealer_name')):
+        return
+
+    # Fetch the primary_dealer of all the counter staff in one query
+    counter_staff_names = list({row.counter_staff_name for row in doc.counter_staff_meet_invite if row.counter_staff_name})
+    primary_dealers = dict(frappe.get_all('Counter Staff Member',
+                                          filters={'name': ['in', counter_staff_names]},
+                                          fields=['name', 'primary_dealer'],
+                                          as_list=True)) if counter_staff_names else {}
+
+    # Count the number of counter staff for each dealer
     dealer_counts = {}
-
-    # Loop through each counter staff in the counter_staff_meet_invite child table
     for row in doc.counter_staff_meet_invite:
-        # Fetch the primary_dealer linked to this counter staff member from the Counter Staff Member Doctype
-        primary_dealer = frappe.db.get_value('Counter Staff Member', row.counter_staff_name, 'primary_dealer')
-
+        primary_dealer = primary_dealers.get(row.counter_staff_name)
         if primary_dealer:
-            # Increment the count for this dealer in dealer_counts
-            if primary_dealer in dealer_counts:
-                dealer_counts[primary_dealer] += 1
-            else:
-                dealer_counts[primary_dealer] = 1
+            dealer_counts[primary_dealer] = dealer_counts.get(primary_dealer, 0) + 1
 
     # Now update the invited_counter_staff field in the dealers_meet_invite child table
     for dealer_row in doc.dealers_meet_invite:
@@ -254,16 +335,35 @@ def validate_counter_staff(doc, method=None):
             frappe.throw(f"Duplicate counter staff {row.counter_staff_name} found. Counter staff must be unique.")
         counter_staff_set.add(row.counter_staff_name)
 
-    # Check for duplicate dealers using dealer_code
+    # Dealers saved before were already checked
+    if not invite_table_changed(doc, 'dealers_meet_invite', 'dealer_name'):
+        return
+
+    # Check for duplicate dealers using dealer_code, fetched for all dealers in one query
+    dealer_names = list({row.dealer_name for row in doc.dealers_meet_invite if row.dealer_name})
+    dealer_codes = dict(frappe.get_all('CPK Dealer',
+                                       filters={'name': ['in', dealer_names]},
+                                       fields=['name', 'dealer_code'],
+                                       as_list=True)) if dealer_names else {}
     dealer_set = set()
 
     for dealer_row in doc.dealers_meet_invite:
-        dealer_code = frappe.get_value("CPK Dealer", dealer_row.dealer_name, "dealer_code")
+        dealer_code = dealer_codes.get(dealer_row.dealer_name)
         if dealer_code in dealer_set:
             frappe.throw(f"Duplicate dealer with code {dealer_code} found. Dealers must be unique.")
         dealer_set.add(dealer_code)
 
 
+def invite_table_changed(doc, table_field, link_field):
+    """Return True if the linked records in an invite table differ from the last saved version of the document."""
+    doc_before_save = doc.get_doc_before_save()
+    if not doc_before_save:
+        return True
+
+    return ([row.get(link_field) for row in doc.get(table_field)]
+            != [row.get(link_field) for row in doc_before_save.get(table_field)])
+
+
 @frappe.whitelist()
 def create_counter_staff_meet_attendance(docname):
     # Fetch the Counter Staff Meet Plan document
@@ -340,76 +440,140 @@ def update_execution_status(doc, method):
         frappe.msgprint(f"The Counter Staff Meet Plan '{meet_plan.meet_name}' has been executed successfully.")
 
 
-def update_painters_execution_status(doc, method):
-    """Update the execution status of the related Painters Meet Plan when attendance is submitted and map skills/products to attendees."""
-    # Check if the attendance document is linked to a Painters Meet Plan
-    if doc.meet_id:
-        # Fetch the corresponding Painters Meet Plan
-        meet_plan = frappe.get_doc("Painters Meet Plan", doc.meet_id)
-
-        # Update the execution status to "Executed"
-        meet_plan.execution_status = "Executed"
-        meet_plan.save(ignore_permissions=True)
-
-        # Ensure the child tables are properly populated before proceeding
-        if not doc.skills or not doc.products:
-            frappe.throw("Skills or Products tables are empty. Please add training details before submitting.")
-
-        # Map skills and products to each Colour App Member
-        map_skills_and_products_to_members(doc)
-
-        frappe.msgprint(f"The Painters Meet Plan '{meet_plan.meet_name}' has been executed successfully.")
-
 def map_skills_and_products_to_members(doc):
-    """Map the training skills and products to each attendee's Colour App Member profile."""
+    """Map the training skills and products to each attendee's Colour App Member profile.
+    The child rows are bulk inserted and last_training_date is set with one UPDATE, without saving each member."""
     # Use the meet_date from the attendance document
     training_date = doc.meet_date
 
-    # Iterate over the list of attendees
-    for attendee in doc.attendance_list:
-        member_name = attendee.member_name
-        member = frappe.get_doc('Colour App Member', member_name)
-
-        # Ensure attendee's profile exists
-        if not member:
-            frappe.throw(f"Member with name '{member_name}' not found.")
-
-        # Map skills from the attendance to the member's profile in 'skills_trained_on'
-        for skill in doc.skills:
-            member.append('skills_trained_on', {
-                'skill_name': skill.skill_name,
-                'training_date': training_date  # Use the meet_date from the attendance
-            })
-        
-        # Map products from the attendance to the member's profile in 'products_trained_on'
-        for product in doc.products:
-            member.append('products_trained_on', {
-                'product_name': product.product_name,
-                'training_date': training_date  # Use the meet_date from the attendance
-            })
-        
-        # Update the last_training_date field with the meet_date from the attendance
-        member.last_training_date = training_date
-
-        # Save the updated Colour App Member with mapped skills, products, and the last_training_date
-        member.save(ignore_permissions=True)
+    # Attendees in order, each member once
+    member_names = list(dict.fromkeys(attendee.member_name for attendee in doc.attendance_list if attendee.member_name))
+    if not member_names:
+        return
+
+    # Ensure every attendee's profile exists
+    existing_members = set(frappe.get_all('Colour App Member', filters={'name': ['in', member_names]}, pluck='name'))
+    missing_members = [member_name for member_name in member_names if member_name not in existing_members]
+    if missing_members:
+        frappe.throw(f"Members not found: {', '.join(missing_members)}")
+
+    # Map skills to 'skills_trained_on' and products to 'products_trained_on'
+    bulk_append_training_rows(member_names, 'Training Skills Detail', 'skills_trained_on', 'skill_name',
+                              [skill.skill_name for skill in doc.skills], training_date)
+    bulk_append_training_rows(member_names, 'Training Products Detail', 'products_trained_on', 'product_name',
+                              [product.product_name for product in doc.products], training_date)
+
+    # Update the last_training_date field of all attendees with the meet_date from the attendance
+    frappe.db.sql("""
+        UPDATE `tabColour App Member`
+        SET last_training_date = %s, modified = %s, modified_by = %s
+        WHERE name IN %s
+    """, (training_date, frappe.utils.now(), frappe.session.user, tuple(member_names)))
+
+    # Log successful mapping
+    frappe.msgprint(f"Skills, products, and last training date for {len(member_names)} members have been updated successfully.")
+
+def bulk_append_training_rows(member_names, child_doctype, parentfield, link_field, values, training_date):
+    """Append one child row per member and value with a single insert, continuing each member's row numbering."""
+    if not values:
+        return
+
+    # Current last row number of each member's table in one query
+    last_idx = dict(frappe.db.sql(f"""
+        SELECT parent, MAX(idx) FROM `tab{child_doctype}`
+        WHERE parenttype = 'Colour App Member' AND parentfield = %s AND parent IN %s
+        GROUP BY parent
+    """, (parentfield, tuple(member_names))))
+
+    timestamp = frappe.utils.now()
+    user = frappe.session.user
+    rows = []
+    for member_name in member_names:
+        idx = last_idx.get(member_name) or 0
+        for value in values:
+            idx += 1
+            rows.append([
+                frappe.generate_hash(length=10), timestamp, timestamp, user, user, 0, idx,
+                member_name, 'Colour App Member', parentfield, value, training_date
+            ])
 
-        # Log successful mapping
-        frappe.msgprint(f"Skills, products, and last training date for {member_name} have been updated successfully.")
+    frappe.db.bulk_insert(child_doctype,
+                          ['name', 'creation', 'modified', 'owner', 'modified_by', 'docstatus', 'idx',
+                           'parent', 'parenttype', 'parentfield', link_field, 'training_date'],
+                          rows)
 
 @frappe.whitelist()
 def get_item_balance(item_code, warehouse):
     """
-    Fetch the latest stock balance from the Merchandise Ledger for a given item and warehouse.
+    Fetch the current stock balance from the Merchandise Bin for a given item and warehouse.
     This will be called via a client-side script.
     """
-    last_entry = frappe.db.get_value(
-        "Merchandise Ledger",
-        {"merchandise_item_code": item_code, "merchandise_warehouse": warehouse},
-        "balance_after",
-        order_by="posting_datetime desc"
-    )
-    return last_entry or 0  # Return 0 if no previous stock entry is found
+    return get_bin_qty(item_code, warehouse)
+
+@frappe.whitelist()
+def get_item_balances(pairs):
+    """
+    Fetch the stock balances of many [item_code, warehouse] pairs in one request for the Merchandise Entry form.
+    Balances come from a short-lived per-warehouse cache. Returns {warehouse: {item_code: balance}}.
+    """
+    pairs = [(item_code, warehouse) for item_code, warehouse in frappe.parse_json(pairs) if item_code and warehouse]
+    warehouse_balances = get_warehouse_balances({warehouse for item_code, warehouse in pairs})
+
+    balances = {}
+    for item_code, warehouse in pairs:
+        balances.setdefault(warehouse, {})[item_code] = warehouse_balances[warehouse].get(item_code, 0)
+    return balances
+
+@frappe.whitelist()
+def get_warehouse_stock(warehouses=None):
+    """
+    Compact read-only stock of one or more warehouses for field users: code, name and balance of each item.
+    Defaults to the warehouse of the current user, other warehouses need read permission on each Merchandise Warehouse.
+    The ETag and Last-Modified headers come from the warehouse stock versions kept in the cache, so a request
+    with If-None-Match or If-Modified-Since for unchanged stock gets a 304 without any database work.
+    """
+    user_warehouse = frappe.get_cached_value('User', frappe.session.user, 'merchandise_warehouse')
+    if not warehouses:
+        warehouses = [user_warehouse] if user_warehouse else []
+    elif isinstance(warehouses, str):
+        warehouses = frappe.parse_json(warehouses) if warehouses.startswith('[') else warehouses.split(',')
+    warehouses = sorted({warehouse.strip() for warehouse in warehouses if warehouse and warehouse.strip()})
+
+    if not warehouses:
+        frappe.throw(_("No Merchandise Warehouse is assigned to you"))
+    # Check each warehouse, so users limited by User Permissions only read the warehouses they are allowed
+    for warehouse in warehouses:
+        if warehouse != user_warehouse:
+            frappe.has_permission('Merchandise Warehouse', 'read', doc=warehouse, throw=True)
+
+    stock_versions = get_stock_versions(warehouses)
+    etag = '"{}"'.format(hashlib.md5(';'.join(
+        f"{warehouse}:{stock_versions[warehouse]['version']}" for warehouse in warehouses
+    ).encode()).hexdigest())
+    last_modified = max(stock_version['modified'] for stock_version in stock_versions.values())
+    headers = {'ETag': etag, 'Last-Modified': http_date(last_modified), 'Cache-Control': 'private, no-cache'}
+
+    if_none_match = frappe.get_request_header('If-None-Match')
+    if_modified_since = parse_date(frappe.get_request_header('If-Modified-Since'))
+    if (if_none_match and etag in [tag.strip() for tag in if_none_match.split(',')]) or (
+            not if_none_match and if_modified_since and last_modified <= if_modified_since):
+        return Response(status=304, headers=headers)
+
+    warehouse_balances = get_warehouse_balances(warehouses)
+    merchandise_items = get_item_masters({item_code for item_balances in warehouse_balances.values() for item_code in item_balances})
+    stock = {
+        warehouse: [
+            {
+                'item_code': item_code,
+                'item_name': merchandise_items[item_code].merchandise_item_name if item_code in merchandise_items else item_code,
+                'balance': balance
+            }
+            for item_code, balance in sorted(warehouse_balances[warehouse].items()) if balance
+        ]
+        for warehouse in warehouses
+    }
+
+    return Response(frappe.as_json({'message': stock}), mimetype='application/json', headers=headers)
 
 #Creates a download button on the Painters Meet Attendance Doctype, where the document has succefully been submitted.
 @frappe.whitelist()
@@ -417,11 +581,10 @@ def download_attendance_excel(docname):
     # Fetch the Painters Meet Attendance document
     doc = frappe.get_doc('Painters Meet Attendance', docname)
 
-    # Create a new Excel file in memory
+    # Create a write-only workbook, rows are streamed out instead of kept as cells
     output = BytesIO()
-    workbook = openpyxl.Workbook()
-    sheet = workbook.active
-    sheet.title = 'Attendance List'
+    workbook = openpyxl.Workbook(write_only=True)
+    sheet = workbook.create_sheet('Attendance List')
 
     # Fetch the actual venue name from the Meet Venue Doctype using the correct field
     meet_venue_name = frappe.db.get_value('Meet Venue', doc.meet_venue, 'meet_venue_name')
@@ -442,22 +605,20 @@ def download_attendance_excel(docname):
     # Add headers for the attendee list
     sheet.append(['Member Name', 'Mobile Number'])
 
-    # Fetch the attendee list from the child table (Painters Meet Attendance Detail)
-    for attendee in doc.attendance_list:
-        # Fetch the full name from the Colour App Member Doctype
-        member_full_name = frappe.db.get_value('Colour App Member', attendee.member_name, 'member_name')
-        member_full_name = member_full_name if member_full_name else attendee.member_name
+    # Fetch the full names of all attendees from the Colour App Member Doctype in one query
+    member_full_names = get_display_names('Colour App Member', 'member_name',
+                                          [attendee.member_name for attendee in doc.attendance_list])
 
+    for attendee in doc.attendance_list:
         # Append the full name and mobile number to the sheet
-        sheet.append([member_full_name, attendee.mobile_number])
+        sheet.append([member_full_names.get(attendee.member_name) or attendee.member_name, attendee.mobile_number])
 
     # Save the workbook to the output stream
     workbook.save(output)
-    output.seek(0)
 
     # Create a file and store it in the file system
     file_name = f"Attendance_List_{docname}.xlsx"
-    saved_file = save_file(file_name, output.read(), doc.doctype, docname, is_private=1)
+    saved_file = save_file(file_name, output.getvalue(), doc.doctype, docname, is_private=1)
 
     # Return the file URL to the frontend
     return saved_file.file_url
@@ -468,13 +629,12 @@ def download_counter_staff_meet_attendance_excel(docname):
     # Fetch the Counter Staff Meet Attendance document
     doc = frappe.get_doc('Counter Staff Meet Attendance', docname)
 
-    # Create a new Excel file in memory
+    # Create a write-only workbook, rows are streamed out instead of kept as cells
     output = BytesIO()
-    workbook = openpyxl.Workbook()
+    workbook = openpyxl.Workbook(write_only=True)
 
     # Create a worksheet for the parent Doctype and meet details
-    sheet = workbook.active
-    sheet.title = 'Counter Staff Meet Attendance'
+    sheet = workbook.create_sheet('Counter Staff Meet Attendance')
 
     # Fetch the venue name from the linked Meet Venue Doctype
     meet_venue_name = frappe.db.get_value('Meet Venue', doc.meet_venue, 'meet_venue_name')
@@ -494,14 +654,12 @@ def download_counter_staff_meet_attendance_excel(docname):
     sheet.append(['Dealers'])
     sheet.append(['Dealer Name', 'Invited Counter Staff'])
 
-    # Fetch the dealer data from the first child table
-    for dealer in doc.dealers:
-        # Fetch the dealer's full name from the CPK Dealer Doctype
-        dealer_name = frappe.db.get_value('CPK Dealer', dealer.dealer_name, 'dealer_name')
-        dealer_name = dealer_name if dealer_name else dealer.dealer_name
+    # Fetch the full names of all dealers from the CPK Dealer Doctype in one query
+    dealer_names = get_display_names('CPK Dealer', 'dealer_name', [dealer.dealer_name for dealer in doc.dealers])
 
+    for dealer in doc.dealers:
         # Append the dealer data to the sheet
-        sheet.append([dealer_name, dealer.invited_counter_staff])
+        sheet.append([dealer_names.get(dealer.dealer_name) or dealer.dealer_name, dealer.invited_counter_staff])
 
     # Add a blank row between the dealer data and the attendance data
     sheet.append([''])
@@ -510,219 +668,30 @@ def download_counter_staff_meet_attendance_excel(docname):
     sheet.append(['Attendance'])
     sheet.append(['Counter Staff Name', 'Mobile Number'])
 
-    # Fetch the attendance data from the second child table
-    for attendee in doc.attendance_list:
-        # Fetch the full name from the Counter Staff Member Doctype
-        counter_staff_name = frappe.db.get_value('Counter Staff Member', attendee.counter_staff_name, 'counter_staff_name')
-        counter_staff_name = counter_staff_name if counter_staff_name else attendee.counter_staff_name
+    # Fetch the full names of all attendees from the Counter Staff Member Doctype in one query
+    counter_staff_names = get_display_names('Counter Staff Member', 'counter_staff_name',
+                                            [attendee.counter_staff_name for attendee in doc.attendance_list])
 
+    for attendee in doc.attendance_list:
         # Append the counter staff attendance data to the sheet
-        sheet.append([counter_staff_name, attendee.mobile_number])
+        sheet.append([counter_staff_names.get(attendee.counter_staff_name) or attendee.counter_staff_name,
+                      attendee.mobile_number])
 
     # Save the workbook to the output stream
     workbook.save(output)
-    output.seek(0)
 
     # Create a file and store it in the file system
     file_name = f"Counter_Staff_Meet_Attendance_List_{docname}.xlsx"
-    saved_file = save_file(file_name, output.read(), doc.doctype, docname, is_private=1)
+    saved_file = save_file(file_name, output.getvalue(), doc.doctype, docname, is_private=1)
 
     # Return the file URL to the frontend
     return saved_file.file_url
 
-#Meet Download Dump goes here ------------------- CHECK CHECK
-@frappe.whitelist()
-def download_single_meet_painters(meet_name, docname):
-    attendance_data = frappe.get_doc("Painters Meet Attendance", meet_name)
-    if attendance_data.docstatus != 1:  # Only download submitted documents
-        frappe.throw(_("Selected meet has not been submitted."))
-
-    # Prepare the data
-    rows = prepare_single_meet_data(attendance_data, 'painters')
-    metadata = {
-        "meet_name": attendance_data.meet_name,
-        "meet_date": attendance_data.get('meet_date'),
-        "meet_venue": frappe.get_value("Meet Venue", attendance_data.meet_venue, "name"),
-        "meet_facilitator": attendance_data.get('meet_facilitator'),
-        "meet_id": attendance_data.get('meet_id'),
-    }
-    create_custom_csv_with_layout(rows, "single_meet_painters.csv", docname, metadata)
-
-@frappe.whitelist()
-def download_single_meet_counter_staff(meet_name, docname):
-    attendance_data = frappe.get_doc("Counter Staff Meet Attendance", meet_name)
-    if attendance_data.docstatus != 1:  # Only download submitted documents
-        frappe.throw(_("Selected meet has not been submitted."))
-
-    # Prepare the data
-    rows = prepare_single_meet_data(attendance_data, 'counter_staff')
-    metadata = {
-        "meet_name": attendance_data.counter_staff_meet_name,
-        "meet_date": attendance_data.get('meet_date'),
-        "meet_venue": frappe.get_value("Meet Venue", attendance_data.meet_venue, "name"),
-        "meet_facilitator": attendance_data.get('meet_facilitator'),
-        "meet_id": attendance_data.get('counter_staff_meet_id'),
-    }
-    create_custom_csv_with_layout(rows, "single_meet_counter_staff.csv", docname, metadata)
-
-def prepare_single_meet_data(attendance_data, meet_type):
-    # Conditional logic based on meet type to handle different field names
-    data = {
-        "meet_name": attendance_data.meet_name if meet_type == 'painters' else attendance_data.counter_staff_meet_name,
-        "meet_id": attendance_data.get('meet_id') if meet_type == 'painters' else attendance_data.get('counter_staff_meet_id'),
-        "meet_venue": frappe.get_value("Meet Venue", attendance_data.meet_venue, "name"),
-        "meet_date": attendance_data.get('meet_date'),
-        "meet_facilitator": attendance_data.get('meet_facilitator'),
-    }
-
-    # Prepare rows for each participant
-    rows = []
-    for participant in attendance_data.attendance_list:
-        row = data.copy()
-        row.update({
-            "member_name": frappe.get_value("Colour App Member", participant.member_name, "name") if meet_type == 'painters' else frappe.get_value("Counter Staff Member", participant.counter_staff_name, "name"),
-            "mobile_number": participant.mobile_number,
-            "gift_one": participant.gift_one,
-            "gift_two": participant.gift_two
-        })
-        rows.append(row)
-    
-    return rows
-
-@frappe.whitelist()
-def download_multiple_meets(meet_type, from_date, to_date, docname):
-    # Fetch the correct doctype and field names based on the meet_type
-    if meet_type == "Painters Meet":
-        doctype = "Painters Meet Attendance"
-        meet_name_field = "meet_name"
-        meet_id_field = "meet_id"
-    else:  # Counter Staff Meet
-        doctype = "Counter Staff Meet Attendance"
-        meet_name_field = "counter_staff_meet_name"
-        meet_id_field = "counter_staff_meet_id"
-    
-    # Retrieve all meets within the date range and ensure the correct fields are fetched
-    meets = frappe.get_all(doctype,
-                           filters={
-                               "meet_date": [">=", getdate(from_date)],
-                               "meet_date": ["<=", getdate(to_date)],
-                               "docstatus": 1  # Only submitted documents
-                           },
-                           fields=["name", meet_name_field, meet_id_field, "meet_venue", "meet_date", "meet_facilitator"])
 
-    rows = []
-    for meet in meets:
-        attendance_data = frappe.get_doc(doctype, meet['name'])  # Correct access to meet data
-        meet_data = {
-            "meet_name": meet[meet_name_field],
-            "meet_id": meet[meet_id_field],
-            "meet_venue": frappe.get_value("Meet Venue", attendance_data.meet_venue, "name"),
-            "meet_date": attendance_data.get('meet_date'),
-            "meet_facilitator": attendance_data.get('meet_facilitator'),
-        }
-        
-        for participant in attendance_data.attendance_list:
-            row = meet_data.copy()
-            row.update({
-                "member_name": frappe.get_value("Colour App Member", participant.member_name, "name") if meet_type == "Painters Meet" else frappe.get_value("Counter Staff Member", participant.counter_staff_name, "name"),
-                "mobile_number": participant.mobile_number,
-                "gift_one": participant.gift_one,
-                "gift_two": participant.gift_two
-            })
-            rows.append(row)
-
-    create_custom_csv_with_layout(rows, "multiple_meets.csv", docname, {})  # Generate CSV
+def get_display_names(doctype, title_field, names):
+    """Return {name: title} for the linked records, fetched in one query"""
+    names = list({name for name in names if name})
+    if not names:
+        return {}
 
-@frappe.whitelist()
-def download_painters_dump(from_date, to_date, docname):
-    # First, get the meets that occurred within the date range
-    meets = frappe.get_all(
-        "Painters Meet Attendance",
-        filters={
-            "meet_date": [">=", getdate(from_date)],
-            "meet_date": ["<=", getdate(to_date)],
-            "docstatus": 1  # Only submitted events
-        },
-        fields=["name"]
-    )
-
-    # Get the members who attended these meets
-    members = []
-    for meet in meets:
-        attendance_data = frappe.get_doc("Painters Meet Attendance", meet['name'])
-        for participant in attendance_data.attendance_list:
-            member_data = frappe.get_value("Colour App Member", participant.member_name, ["name", "mobile_number", "last_training_date"], as_dict=True)
-            # Ensure we add only if this member doesn't have a duplicate entry with the same last_training_date
-            if not any(m['name'] == member_data['name'] and m['last_training_date'] == member_data['last_training_date'] for m in members):
-                members.append(member_data)
-
-    # Create CSV with just the necessary columns
-    create_custom_csv_with_layout(members, "painters_dump.csv", docname, {})
-
-@frappe.whitelist()
-def download_counter_staff_dump(from_date, to_date, docname):
-    # First, get the meets that occurred within the date range
-    meets = frappe.get_all(
-        "Counter Staff Meet Attendance",
-        filters={
-            "meet_date": [">=", getdate(from_date)],
-            "meet_date": ["<=", getdate(to_date)],
-            "docstatus": 1  # Only submitted events
-        },
-        fields=["name"]
-    )
-
-    # Get the members who attended these meets
-    members = []
-    for meet in meets:
-        attendance_data = frappe.get_doc("Counter Staff Meet Attendance", meet['name'])
-        for participant in attendance_data.attendance_list:
-            member_data = frappe.get_value("Counter Staff Member", participant.counter_staff_name, ["name", "mobile_number", "last_training_date"], as_dict=True)
-            # Ensure we add only if this member doesn't have a duplicate entry with the same last_training_date
-            if not any(m['name'] == member_data['name'] and m['last_training_date'] == member_data['last_training_date'] for m in members):
-                members.append(member_data)
-
-    # Create CSV with just the necessary columns
-    create_custom_csv_with_layout(members, "counter_staff_dump.csv", docname, {})
-
-# Adjusted CSV creation function
-def create_custom_csv_with_layout(data, filename, docname, metadata):
-    # Ensure the private/files directory exists
-    directory = frappe.get_site_path('private', 'files')
-    if not os.path.exists(directory):
-        os.makedirs(directory)
-
-    # Generate the full file path
-    file_path = os.path.join(directory, filename)
-    
-    with open(file_path, mode='w', newline='') as file:
-        writer = csv.writer(file)
-
-        # Write the table headers
-        headers = ["Member Name", "Mobile Number", "Last Training Date"]
-        writer.writerow(headers)
-
-        # Write participant rows with proper spacing
-        for row in data:
-            writer.writerow([
-                row.get("name", ""),
-                row.get("mobile_number", ""),
-                row.get("last_training_date", "")
-            ])
-    
-    # Generate the file URL for attaching the document
-    file_url = os.path.join('/private/files', filename)
-    
-    # Attach the file to the current document
-    attach_file_to_document(docname, filename, file_url)
-
-def attach_file_to_document(docname, filename, file_url):
-    file_doc = frappe.get_doc({
-        'doctype': 'File',
-        'file_name': filename,
-        'attached_to_doctype': 'Meet Dump Download',
-        'attached_to_name': docname,
-        'file_url': file_url,
-        'is_private': 1,  # Set to private
-    })
-    file_doc.save()
\ No newline at end of file
+    return dict(frappe.get_all(doctype, filters={'name': ['in', names]}, fields=['name', title_field], as_list=True))
@@ -0,0 +1,127 @@
+# Copyright (c) 2024, Victor Mandela and contributors
+# For license information, please see license.txt
+
+"""
+Benchmark for the painters member dump on synthetic attendance rows.
+
+Run on a test site, all synthetic data is rolled back at the end. Synthetic names and mobile numbers start
+with BENCH so they cannot collide with real members, and only BENCH- rows left by an interrupted run are deleted:
+
+    bench --site test_site execute colorapp.benchmarks.member_dump.run
+    bench --site test_site execute colorapp.benchmarks.member_dump.run --kwargs "{'sizes': [10000]}"
+"""
+
+import time
+import frappe
+from colorapp.meet.meet_export import iter_member_dump_rows
+
+DEFAULT_SIZES = (10_000, 100_000, 500_000)
+
+# Synthetic data shape: attendees per meet and attendance rows per distinct member
+ATTENDEES_PER_MEET = 300
+ROWS_PER_MEMBER = 10
+
+# The previous list scan is quadratic, it is only timed up to this many rows
+LIST_SCAN_LIMIT = 20_000
+
+FROM_DATE = "2099-01-01"
+TO_DATE = "2099-12-31"
+
+
+def run(sizes=DEFAULT_SIZES):
+    results = []
+    for size in sizes:
+        try:
+            delete_bench_rows()
+            make_attendance_rows(size)
+            results.append(time_dump(size))
+        finally:
+            frappe.db.rollback()
+
+    print(f"{'rows':>10} {'members':>10} {'distinct sql (s)':>18} {'list scan (s)':>15}")
+    for result in results:
+        list_scan = f"{result['list_scan']:.2f}" if result["list_scan"] is not None else "skipped"
+        print(f"{result['rows']:>10} {result['members']:>10} {result['distinct_sql']:>18.2f} {list_scan:>15}")
+
+    return results
+
+
+def time_dump(size):
+    started = time.perf_counter()
+    members = sum(1 for row in iter_member_dump_rows("Painters Meet Attendance", FROM_DATE, TO_DATE))
+    distinct_sql = time.perf_counter() - started
+
+    list_scan = None
+    if size <= LIST_SCAN_LIMIT:
+        started = time.perf_counter()
+        list_scan_dump()
+        list_scan = time.perf_counter() - started
+
+    return {"rows": size, "members": members, "distinct_sql": distinct_sql, "list_scan": list_scan}
+
+
+def list_scan_dump():
+    """
+    The deduplication the dump used before, a scan of the collected members for every attendance row.
+    """
+    rows = frappe.db.sql("""
+        SELECT member.name, member.mobile_number, member.last_training_date
+        FROM `tabPainters Meet Attendance Detail` detail
+        INNER JOIN `tabPainters Meet Attendance` meet ON meet.name = detail.parent
+        INNER JOIN `tabColour App Member` member ON member.name = detail.member_name
+        WHERE meet.docstatus = 1 AND meet.meet_date BETWEEN %s AND %s
+    """, (FROM_DATE, TO_DATE), as_dict=True)
+
+    members = []
+    for member_data in rows:
+        if not any(m["name"] == member_data["name"] and m["last_training_date"] == member_data["last_training_date"] for m in members):
+            members.append(member_data)
+    return members
+
+
+def delete_bench_rows():
+    """
+    Deletes synthetic rows left by an earlier run, only names starting with BENCH- are touched.
+    """
+    for doctype in ("Painters Meet Attendance Detail", "Painters Meet Attendance", "Colour App Member"):
+        frappe.db.delete(doctype, {"name": ["like", "BENCH-%"]})
+
+
+def make_attendance_rows(size):
+    """
+    Inserts size attendance rows spread over submitted meets in the benchmark date range.
+    """
+    timestamp = frappe.utils.now()
+    user = frappe.session.user
+    member_count = max(1, size // ROWS_PER_MEMBER)
+    meet_count = max(1, size // ATTENDEES_PER_MEET)
+
+    frappe.db.bulk_insert(
+        "Colour App Member",
+        ["name", "creation", "modified", "owner", "modified_by", "docstatus", "idx",
+            "member_app_number", "first_name", "second_name", "member_name", "mobile_number", "last_training_date"],
+        [
+            [f"BENCH-M{i:07d}", timestamp, timestamp, user, user, 0, 0,
+                f"BENCH-M{i:07d}", "Bench", "Member", "Bench Member", f"BENCH{i:08d}", "2099-06-30"]
+            for i in range(member_count)
+        ]
+    )
+    frappe.db.bulk_insert(
+        "Painters Meet Attendance",
+        ["name", "creation", "modified", "owner", "modified_by", "docstatus", "idx", "meet_id", "meet_name", "meet_date"],
+        [
+            [f"BENCH-PMA{i:06d}", timestamp, timestamp, user, user, 1, 0, f"BENCH-PMA{i:06d}", "Bench Meet", FROM_DATE]
+            for i in range(meet_count)
+        ]
+    )
+    frappe.db.bulk_insert(
+        "Painters Meet Attendance Detail",
+        ["name", "creation", "modified", "owner", "modified_by", "docstatus", "idx",
+            "parent", "parenttype", "parentfield", "member_name", "mobile_number"],
+        [
+            [f"BENCH-PMAD{i:07d}", timestamp, timestamp, user, user, 1, i % ATTENDEES_PER_MEET + 1,
+                f"BENCH-PMA{i % meet_count:06d}", "Painters Meet Attendance", "attendance_list",
+                f"BENCH-M{i % member_count:07d}", f"BENCH{i % member_count:08d}"]
+            for i in range(size)
+        ]
+    )
@@ -3,9 +3,12 @@
 
 import frappe
 from frappe.model.document import Document
-import random
+from colorapp.member_numbers import allocate_member_numbers
 from datetime import datetime, timedelta
 
+# Fields that identify a member, each enforced by a unique index
+IDENTITY_FIELDS = ("mobile_number", "id_number", "tk_membership_number")
+
 class ColourAppMember(Document):
 
     def before_insert(self):
@@ -20,14 +23,8 @@ class ColourAppMember(Document):
         # Combine first_name, second_name, and last_name into member_name
         self.member_name = self.combine_names(self.first_name, self.second_name, self.last_name)
         
-        # Ensure the mobile_number is unique
-        self.validate_unique_mobile_number()
-
-        # Ensure the national_id is unique
-        self.validate_unique_national_id()
-
-        # Ensure the tk_membership_number is unique
-        self.validate_unique_tk_membership_number()
+        # Ensure the mobile_number, national_id and tk_membership_number are unique
+        self.validate_unique_identity_fields()
 
         # Validate the date of birth
         self.validate_age()
@@ -38,47 +35,47 @@ class ColourAppMember(Document):
         return combined_name
 
     def generate_unique_membership_number(self):
-        number = random.randint(10000000, 99999999)
-        while frappe.db.exists('ColourAppMember', {'member_app_number': str(number)}):
-            number = random.randint(10000000, 99999999)
-        return str(number)
+        return allocate_member_numbers("Colour App Member")[0]
 
     def autoname(self):
         self.name = self.member_app_number
 
-    def validate_unique_mobile_number(self):
-        if self.mobile_number:
-            # Use SQL query to check for duplicate mobile numbers
-            existing_member = frappe.db.sql("""
-                SELECT name FROM `tabColour App Member`
-                WHERE mobile_number = %s AND name != %s
-            """, (self.mobile_number, self.name))
-
-            if existing_member:
-                frappe.throw(f"The mobile number {self.mobile_number} is already associated with another member.")
-    
-    def validate_unique_national_id(self):
-        if self.id_number:
-            # Use SQL query to check for duplicate national ID numbers
-            existing_member = frappe.db.sql("""
-                SELECT name FROM `tabColour App Member`
-                WHERE id_number = %s AND name != %s
-            """, (self.id_number, self.name))
-
-            if existing_member:
-                frappe.throw(f"The national ID {self.id_number} is already associated with another member.")
-
-    def validate_unique_tk_membership_number(self):
-        if self.tk_membership_number:
-            # Use SQL query to check for duplicate tk_membership_number
-            existing_member = frappe.db.sql("""
-                SELECT name FROM `tabColour App Member`
-                WHERE tk_membership_number = %s AND name != %s
-            """, (self.tk_membership_number, self.name))
-
-            if existing_member:
-                frappe.throw(f"The TK Membership Number {self.tk_membership_number} is already associated with another member.")
-    
+    def validate_unique_identity_fields(self):
+        # Only fields that changed since the last save are checked, in one query.
+        # The unique indexes on the fields reject duplicates saved concurrently.
+        changed_fields = [
+            fieldname for fieldname in IDENTITY_FIELDS
+            if self.get(fieldname) and self.has_value_changed(fieldname)
+        ]
+        if not changed_fields:
+            return
+
+        conditions = " OR ".join(f"`{fieldname}` = %({fieldname})s" for fieldname in changed_fields)
+        existing_members = frappe.db.sql(f"""
+            SELECT {", ".join(changed_fields)} FROM `tabColour App Member`
+            WHERE name != %(name)s AND ({conditions})
+        """, dict({fieldname: self.get(fieldname) for fieldname in changed_fields}, name=self.name or ""), as_dict=True)
+
+        for fieldname in changed_fields:
+            if any(member.get(fieldname) == self.get(fieldname) for member in existing_members):
+                self.throw_duplicate(fieldname)
+
+    def show_unique_validation_message(self, e):
+        # Called by the framework when a unique index rejects the row, e.g. "Duplicate entry '...' for key 'mobile_number'"
+        key_name = str(e).split("'")[-2].split(".")[-1]
+        if key_name in IDENTITY_FIELDS:
+            self.throw_duplicate(key_name)
+        super().show_unique_validation_message(e)
+
+    def throw_duplicate(self, fieldname):
+        value = self.get(fieldname)
+        if fieldname == "mobile_number":
+            frappe.throw(f"The mobile number {value} is already associated with another member.", frappe.UniqueValidationError)
+        elif fieldname == "id_number":
+            frappe.throw(f"The national ID {value} is already associated with another member.", frappe.UniqueValidationError)
+        else:
+            frappe.throw(f"The TK Membership Number {value} is already associated with another member.", frappe.UniqueValidationError)
+
     def validate_age(self):
         if self.date_of_birth:
             try:
@@ -2,13 +2,13 @@
 # For license information, please see license.txt
 
 import frappe
-import random
 from frappe.model.document import Document
+from colorapp.member_numbers import allocate_member_numbers
 
 class CounterStaffMember(Document):
 
     def before_insert(self):
-        # Generate the 8-digit random number for member_app_number
+        # Generate the 8-digit number for member_app_number
         if not self.member_app_number:
             self.member_app_number = self.generate_unique_member_app_number()
 
@@ -39,9 +39,5 @@ class CounterStaffMember(Document):
                 frappe.throw(f"The mobile number {self.mobile_number} is already associated with another member.")
 
     def generate_unique_member_app_number(self):
-        # Generate a random 8-digit number
-        member_app_number = random.randint(10000000, 99999999)
-        # Ensure the generated number is unique
-        while frappe.db.exists("Counter Staff Member", {"member_app_number": str(member_app_number)}):
-            member_app_number = random.randint(10000000, 99999999)
-        return str(member_app_number)
+        # Allocate the next 8-digit number, unique without checking existing members
+        return allocate_member_numbers("Counter Staff Member")[0]
@@ -152,6 +152,18 @@ app_license = "mit"
 # 	],
 # }
 
+scheduler_events = {
+	"hourly": [
+		"colorapp.merchandise.stock_alerts.send_low_stock_digest"
+	],
+	"hourly_long": [
+		"colorapp.merchandise.repost.process_repost_queue"
+	],
+	"monthly_long": [
+		"colorapp.merchandise.period_closing.make_monthly_closing"
+	],
+}
+
 # Testing
 # -------
 
@@ -239,11 +251,14 @@ doc_events = {
     "Counter Staff Meet Attendance": {
         "on_submit": "colorapp.api.update_execution_status"  # Trigger this function when attendance is submitted
     },
-     "Painters Meet Attendance": {
-        "on_submit": "colorapp.api.update_painters_execution_status"  # Trigger this function when attendance is submitted
+    "User": {
+        "on_update": "colorapp.merchandise.masters.clear_user_warehouse",  # Clear the cached warehouse user
+        "on_trash": "colorapp.merchandise.masters.clear_user_warehouse"
     }
 }
 
 doctype_js = {
     "Merchandise Entry": "public/js/merchandise_entry.js"
 }
+
+after_migrate = "colorapp.indexes.create_indexes"  # Create the managed database indexes
@@ -0,0 +1,48 @@
+# Copyright (c) 2024, Victor Mandela and contributors
+# For license information, please see license.txt
+
+import frappe
+
+# Indexes for the hot lookups of the app as (doctype, index name, columns).
+# Equality columns come before range and sort columns.
+INDEXES = [
+    # Balance and ledger lookups filter by item and warehouse and sort by posting time
+    ("Merchandise Ledger", "item_warehouse_posting_index", ["merchandise_item_code", "merchandise_warehouse", "posting_datetime"]),
+    # Period closings sum and archive ledger rows by posting time
+    ("Merchandise Ledger", "posting_datetime_index", ["posting_datetime"]),
+    # Postings look up the unresolved alert of each item and warehouse
+    ("Merchandise Stock Alert", "item_warehouse_status_index", ["merchandise_item_code", "merchandise_warehouse", "status"]),
+    # Postings update warehouse balances by warehouse and item
+    ("Warehouse Merchandise Detail", "parent_item_index", ["parent", "merchandise_item_code"]),
+    # Member lookups during invitee upload. Colour App Member identity fields have unique indexes from the doctype.
+    ("Counter Staff Member", "mobile_number_index", ["mobile_number"]),
+    # Member dumps page through attendance rows by member
+    ("Painters Meet Attendance Detail", "member_name_index", ["member_name"]),
+    ("Counter Staff Meet Attendance Detail", "counter_staff_name_index", ["counter_staff_name"]),
+    # Exports select submitted attendance in a date range
+    ("Painters Meet Attendance", "docstatus_meet_date_index", ["docstatus", "meet_date"]),
+    ("Counter Staff Meet Attendance", "docstatus_meet_date_index", ["docstatus", "meet_date"]),
+]
+
+
+def create_indexes():
+    """
+    Creates the indexes in INDEXES that do not exist yet. Runs after every migrate.
+    """
+    for doctype, index_name, columns in INDEXES:
+        frappe.db.add_index(doctype, columns, index_name=index_name)
+
+
+def get_index_status():
+    """
+    Returns each index in INDEXES with whether it exists in the database.
+    """
+    status = []
+    for doctype, index_name, columns in INDEXES:
+        status.append({
+            "doctype_name": doctype,
+            "index_name": index_name,
+            "columns": ", ".join(columns),
+            "exists": 1 if frappe.db.has_index(f"tab{doctype}", index_name) else 0
+        })
+    return status
@@ -25,6 +25,17 @@ frappe.ui.form.on('Counter Staff Meet Attendance', {
                     }
                 });
             });
+
+            // Show the progress of the background merchandise issue
+            let status = frm.doc.post_submit_status;
+            if (status === 'Queued' || status === 'Running') {
+                frm.dashboard.set_headline_alert(__('Post-submit processing is {0}', [__(status).toLowerCase()]), 'blue');
+            } else if (status === 'Failed') {
+                frm.dashboard.set_headline_alert(__('Post-submit processing failed, see Post Submit Processing for details'), 'red');
+                frm.add_custom_button(__('Retry Post Submit Processing'), function() {
+                    frm.call('retry_post_submit').then(() => frm.reload_doc());
+                });
+            }
         }
     }
 });
@@ -1,9 +1,9 @@
 # Copyright (c) 2024, Victor Mandela and contributors
 # For license information, please see license.txt
 
-# import frappe
-from frappe.model.document import Document
+from colorapp.meet.meet_merchandise import MeetMerchandiseController
 
 
-class CounterStaffMeetAttendance(Document):
-	pass
+class CounterStaffMeetAttendance(MeetMerchandiseController):
+	gift_issued_field = "giftissued"
+	member_field = "counter_staff_name"
@@ -44,78 +44,49 @@ frappe.ui.form.on('Meet Dump Download', {
 
     refresh: function(frm) {
         frm.add_custom_button(__('Download Data'), function() {
-            if (frm.doc.download_type === "Single Meet") {
-                if (frm.doc.meet_type === "Painters Meet") {
-                    frappe.call({
-                        method: 'colorapp.api.download_single_meet_painters',
-                        args: {
-                            meet_name: frm.doc.select_painters_meet,
-                            docname: frm.doc.name  // Pass the current document name
-                        },
-                        callback: function(r) {
-                            if (r.message) {
-                                window.open(r.message);  // Open the download link
-                            }
-                        }
-                    });
-                } else if (frm.doc.meet_type === "Counter Staff Meet") {
-                    frappe.call({
-                        method: 'colorapp.api.download_single_meet_counter_staff',
-                        args: {
-                            meet_name: frm.doc.select_counter_staff_meet,
-                            docname: frm.doc.name  // Pass the current document name
-                        },
-                        callback: function(r) {
-                            if (r.message) {
-                                window.open(r.message);  // Open the download link
-                            }
-                        }
-                    });
-                }
-            } else if (frm.doc.download_type === "Multiple Meets") {
-                frappe.call({
-                    method: 'colorapp.api.download_multiple_meets',
-                    args: {
-                        meet_type: frm.doc.meet_type,
-                        from_date: frm.doc.from_date,
-                        to_date: frm.doc.to_date,
-                        docname: frm.doc.name  // Pass the current document name
-                    },
-                    callback: function(r) {
-                        if (r.message) {
-                            window.open(r.message);  // Open the download link
-                        }
-                    }
-                });
-            } else if (frm.doc.download_type === "Painters Dump") {
-                frappe.call({
-                    method: 'colorapp.api.download_painters_dump',
-                    args: {
-                        from_date: frm.doc.from_date,
-                        to_date: frm.doc.to_date,
-                        docname: frm.doc.name  // Pass the current document name
-                    },
-                    callback: function(r) {
-                        if (r.message) {
-                            window.open(r.message);  // Open the download link
-                        }
-                    }
-                });
-            } else if (frm.doc.download_type === "Counter Staff Dump") {
-                frappe.call({
-                    method: 'colorapp.api.download_counter_staff_dump',
-                    args: {
-                        from_date: frm.doc.from_date,
-                        to_date: frm.doc.to_date,
-                        docname: frm.doc.name  // Pass the current document name
-                    },
-                    callback: function(r) {
-                        if (r.message) {
-                            window.open(r.message);  // Open the download link
-                        }
-                    }
+            // Exports run in the background, save first so the job reads the current selection
+            if (frm.is_dirty() || frm.doc.__islocal) {
+                frm.save().then(function() {
+                    start_export(frm);
                 });
+            } else {
+                start_export(frm);
+            }
+        });
+
+        if (frm.doc.status === "Completed" && frm.doc.export_file) {
+            frm.add_custom_button(__('Open Export File'), function() {
+                window.open(frm.doc.export_file);
+            });
+        }
+
+        // Show progress pushed by the export job
+        frappe.realtime.off('meet_dump_download_progress');
+        frappe.realtime.on('meet_dump_download_progress', function(data) {
+            if (data.name !== frm.doc.name) {
+                return;
+            }
+
+            if (data.status === "Completed" || data.status === "Failed") {
+                frm.dashboard.hide_progress();
+                frm.reload_doc();
+            } else {
+                frm.dashboard.show_progress(
+                    __('Export'),
+                    data.progress || 0,
+                    __('{0} rows exported in {1} seconds', [data.rows_exported || 0, data.elapsed_time || 0])
+                );
             }
         });
     }
 });
+
+function start_export(frm) {
+    frm.call('start_export').then(function() {
+        frappe.show_alert({
+            message: __('Export queued, the file will be attached when it is ready'),
+            indicator: 'blue'
+        });
+        frm.reload_doc();
+    });
+}
@@ -1,9 +1,134 @@
 # Copyright (c) 2024, Victor Mandela and contributors
 # For license information, please see license.txt
 
-# import frappe
+import time
+import frappe
+from frappe import _
 from frappe.model.document import Document
+from frappe.utils.background_jobs import is_job_enqueued
+from colorapp.meet.meet_export import (
+	MEET_EXPORT_HEADERS, MEMBER_DUMP_HEADERS, count_meet_rows, count_member_dump_rows,
+	iter_meet_rows, iter_member_dump_rows, iter_single_meet_rows, write_csv_export
+)
+
+# Rows written between progress updates
+PROGRESS_INTERVAL = 1000
 
 
 class MeetDumpDownload(Document):
-	pass
+
+	@frappe.whitelist()
+	def start_export(self):
+		"""
+		Queues the export on the long queue, the file is attached to this document when it finishes.
+		An export left Queued or Running by a job that is no longer queued or running, such as one whose
+		worker died, is started again.
+		"""
+		if self.status in ("Queued", "Running") and is_job_enqueued(self.get_export_job_id()):
+			frappe.throw(_("An export is already in progress for {0}").format(self.name))
+
+		self.db_set({
+			"status": "Queued",
+			"progress": 0,
+			"rows_exported": 0,
+			"elapsed_time": 0,
+			"export_file": None,
+			"error_log": None
+		})
+		frappe.enqueue(
+			run_export,
+			queue="long",
+			timeout=3600,
+			job_id=self.get_export_job_id(),
+			deduplicate=True,
+			enqueue_after_commit=True,
+			docname=self.name
+		)
+
+	def get_export_job_id(self):
+		return f"meet_dump_download::{self.name}"
+
+	def get_export(self):
+		"""
+		Returns the file name, headers, row generator and expected row count for the selected download type.
+		"""
+		attendance_doctype = "Painters Meet Attendance" if self.meet_type == "Painters Meet" else "Counter Staff Meet Attendance"
+
+		if self.download_type == "Single Meet":
+			meet_name = self.select_painters_meet if self.meet_type == "Painters Meet" else self.select_counter_staff_meet
+			attendance_doc = frappe.get_doc(attendance_doctype, meet_name)
+			if attendance_doc.docstatus != 1:  # Only download submitted documents
+				frappe.throw(_("Selected meet has not been submitted."))
+			return (
+				f"{self.name}_single_meet.csv", MEET_EXPORT_HEADERS,
+				iter_single_meet_rows(attendance_doc), len(attendance_doc.attendance_list)
+			)
+
+		if not self.from_date or not self.to_date:
+			frappe.throw(_("From Date and To Date are required for {0}").format(self.download_type))
+
+		if self.download_type == "Multiple Meets":
+			return (
+				f"{self.name}_multiple_meets.csv", MEET_EXPORT_HEADERS,
+				iter_meet_rows(attendance_doctype, self.from_date, self.to_date),
+				count_meet_rows(attendance_doctype, self.from_date, self.to_date)
+			)
+
+		dump_doctype = "Painters Meet Attendance" if self.download_type == "Painters Dump" else "Counter Staff Meet Attendance"
+		return (
+			f"{self.name}_{frappe.scrub(self.download_type)}.csv", MEMBER_DUMP_HEADERS,
+			iter_member_dump_rows(dump_doctype, self.from_date, self.to_date),
+			count_member_dump_rows(dump_doctype, self.from_date, self.to_date)
+		)
+
+
+def run_export(docname):
+	"""
+	Background job writing the export of a Meet Dump Download, tracking progress on the document.
+	"""
+	doc = frappe.get_doc("Meet Dump Download", docname)
+	started = time.monotonic()
+	update_export_status(doc, started, status="Running", commit=True)
+
+	try:
+		filename, headers, rows, total_rows = doc.get_export()
+		file_url = write_csv_export(filename, docname, headers, track_progress(doc, rows, total_rows, started))
+		update_export_status(doc, started, status="Completed", progress=100, export_file=file_url, commit=True)
+	except Exception:
+		frappe.db.rollback()
+		update_export_status(doc, started, status="Failed", error_log=frappe.get_traceback(), commit=True)
+		doc.log_error(_("Meet Dump Download export failed"))
+
+
+def track_progress(doc, rows, total_rows, started):
+	"""
+	Passes the rows through, updating rows_exported and progress every PROGRESS_INTERVAL rows.
+	"""
+	rows_exported = 0
+	for row in rows:
+		yield row
+		rows_exported += 1
+		if rows_exported % PROGRESS_INTERVAL == 0:
+			progress = min(99, rows_exported * 100 / total_rows) if total_rows else 0
+			update_export_status(doc, started, rows_exported=rows_exported, progress=progress, commit=True)
+
+	doc.rows_exported = rows_exported
+
+
+def update_export_status(doc, started, commit=False, **values):
+	values["elapsed_time"] = round(time.monotonic() - started, 1)
+	values.setdefault("rows_exported", doc.rows_exported or 0)
+	doc.db_set(values, commit=commit, update_modified=False)
+
+	frappe.publish_realtime(
+		"meet_dump_download_progress",
+		{
+			"name": doc.name,
+			"status": doc.status,
+			"progress": doc.progress,
+			"rows_exported": doc.rows_exported,
+			"elapsed_time": doc.elapsed_time
+		},
+		doctype=doc.doctype,
+		docname=doc.name
+	)
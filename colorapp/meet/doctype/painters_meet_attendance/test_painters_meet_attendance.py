@@ -1,9 +1,42 @@
 # Copyright (c) 2024, Victor Mandela and Contributors
 # See license.txt
 
-# import frappe
+import frappe
 from frappe.tests.utils import FrappeTestCase
+from frappe.utils import add_days, get_datetime, getdate, today
+from colorapp.meet.post_submit import issue_merchandise
+from colorapp.merchandise.doctype.merchandise_bin.merchandise_bin import get_bin_qty
+from colorapp.tests.utils import make_merchandise_entry, make_merchandise_item, make_merchandise_warehouse
 
 
 class TestPaintersMeetAttendance(FrappeTestCase):
-	pass
+	def test_retried_issue_posts_at_submit_time(self):
+		item_code = make_merchandise_item()
+		warehouse = make_merchandise_warehouse()
+		make_merchandise_entry("Merchandise Receipt", item_code, 10, target_warehouse=warehouse,
+			posting_date=add_days(today(), -3), posting_time="09:00:00")
+
+		attendance = frappe.get_doc({
+			"doctype": "Painters Meet Attendance",
+			"meet_id": f"_Test Meet {frappe.generate_hash(length=8)}",
+			"user_merchandise_warehouse": warehouse,
+			"training_supplies": [{"training_supply_name": item_code, "quantity": 2}]
+		})
+		attendance.flags.ignore_links = True
+		attendance.insert(ignore_permissions=True)
+
+		# Submitted two days ago, the post-submit job failed and is retried now
+		submitted_on = get_datetime(f"{add_days(today(), -2)} 10:00:00")
+		attendance.db_set({"docstatus": 1, "merchandise_posting_datetime": submitted_on})
+		attendance.reload()
+
+		issue_merchandise(attendance)
+		merchandise_entry = frappe.get_doc("Merchandise Entry", attendance.merchandise_entry)
+		self.assertEqual(getdate(merchandise_entry.posting_date), submitted_on.date())
+		self.assertEqual(get_datetime(merchandise_entry.posting_datetime), submitted_on)
+		self.assertEqual(get_bin_qty(item_code, warehouse), 8)
+
+		# A second retry reuses the submitted issue instead of posting the stock again
+		issue_merchandise(attendance)
+		self.assertEqual(attendance.merchandise_entry, merchandise_entry.name)
+		self.assertEqual(get_bin_qty(item_code, warehouse), 8)
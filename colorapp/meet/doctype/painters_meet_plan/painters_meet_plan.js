@@ -68,31 +68,33 @@ frappe.ui.form.on('Painters Meet Plan', {
 });
 
 function initiate_invitees_upload(frm) {
-    const file_input = $('<input type="file" accept=".xls,.xlsx">');
-    file_input.on('change', function() {
-        const file = this.files[0];
-        if (file) {
-            const reader = new FileReader();
-            reader.onload = function(e) {
-                const binary_data = e.target.result;  // Get the binary string content directly
-                frappe.call({
-                    method: 'colorapp.api.upload_invitees',
-                    args: {
-                        file_data: binary_data,  // Send the binary string content
-                        plan_name: frm.doc.name
-                    },
-                    callback: function(r) {
-                        if (r.message) {
-                            frappe.msgprint(__('Invitees uploaded successfully'));
-                            frm.reload_doc(); // Reload to refresh the child table
-                        }
+    // Upload the sheet as a File so the server reads it from disk instead of from the request
+    new frappe.ui.FileUploader({
+        doctype: frm.doctype,
+        docname: frm.doc.name,
+        folder: 'Home/Attachments',
+        make_attachments_public: false,
+        restrictions: {
+            allowed_file_types: ['.xlsx', '.csv']
+        },
+        on_success: function(file_doc) {
+            frappe.call({
+                method: 'colorapp.api.upload_invitees',
+                args: {
+                    file_url: file_doc.file_url,  // Server streams the uploaded file
+                    plan_name: frm.doc.name
+                },
+                freeze: true,
+                freeze_message: __('Uploading invitees...'),
+                callback: function(r) {
+                    if (r.message) {
+                        frappe.msgprint(__('Invitees uploaded successfully'));
+                        frm.reload_doc(); // Reload to refresh the child table
                     }
-                });
-            };
-            reader.readAsBinaryString(file);  // Read file as binary string
+                }
+            });
         }
     });
-    file_input.click(); // Trigger the file selection dialog
 }
 
 // Function to check for duplicate members in the child table
@@ -0,0 +1,229 @@
+# Copyright (c) 2024, Victor Mandela and contributors
+# For license information, please see license.txt
+
+import csv
+import os
+import frappe
+from frappe.utils import getdate
+
+# Rows read per query when streaming exports
+CHUNK_SIZE = 5000
+
+MEMBER_DUMP_HEADERS = ["Member Name", "Mobile Number", "Last Training Date"]
+MEET_EXPORT_HEADERS = [
+    "Meet Name", "Meet ID", "Meet Venue", "Meet Date", "Meet Facilitator",
+    "Member ID", "Member Name", "Mobile Number", "Gift One", "Gift Two"
+]
+
+# Field names that differ between the painters and counter staff attendance doctypes
+ATTENDANCE_DOCTYPES = {
+    "Painters Meet Attendance": frappe._dict({
+        "detail_doctype": "Painters Meet Attendance Detail",
+        "member_doctype": "Colour App Member",
+        "member_field": "member_name",
+        "member_title_field": "member_name",
+        "meet_name_field": "meet_name",
+        "meet_id_field": "meet_id"
+    }),
+    "Counter Staff Meet Attendance": frappe._dict({
+        "detail_doctype": "Counter Staff Meet Attendance Detail",
+        "member_doctype": "Counter Staff Member",
+        "member_field": "counter_staff_name",
+        "member_title_field": "counter_staff_name",
+        "meet_name_field": "counter_staff_meet_name",
+        "meet_id_field": "counter_staff_meet_id"
+    }),
+}
+
+
+def write_csv_export(filename, docname, headers, rows):
+    """
+    Writes the rows to a private CSV file as they are produced and attaches it to the Meet Dump Download.
+    rows can be any iterable of lists, so the export is never held in memory. Returns the file URL.
+    """
+    directory = frappe.get_site_path("private", "files")
+    os.makedirs(directory, exist_ok=True)
+
+    with open(os.path.join(directory, filename), mode="w", newline="") as file:
+        writer = csv.writer(file)
+        writer.writerow(headers)
+        for row in rows:
+            writer.writerow(row)
+
+    return attach_file_to_document(docname, filename, f"/private/files/{filename}")
+
+
+def attach_file_to_document(docname, filename, file_url):
+    """
+    Attaches the exported file to the Meet Dump Download, once per file URL.
+    """
+    if not frappe.db.exists("File", {
+        "file_url": file_url,
+        "attached_to_doctype": "Meet Dump Download",
+        "attached_to_name": docname
+    }):
+        frappe.get_doc({
+            "doctype": "File",
+            "file_name": filename,
+            "attached_to_doctype": "Meet Dump Download",
+            "attached_to_name": docname,
+            "file_url": file_url,
+            "is_private": 1,
+        }).insert(ignore_permissions=True)
+
+    return file_url
+
+
+def iter_member_dump_rows(attendance_doctype, from_date, to_date, chunk_size=CHUNK_SIZE):
+    """
+    Yields [member, mobile number, last training date] for each member who attended a submitted meet in the date range.
+    Members are deduplicated by the database with SELECT DISTINCT and read in chunks, paginated on the member name,
+    so nothing is kept in memory between chunks.
+    """
+    config = ATTENDANCE_DOCTYPES[attendance_doctype]
+    last_member = ""
+
+    while True:
+        chunk = frappe.db.sql(f"""
+            SELECT DISTINCT member.name AS member, member.mobile_number, member.last_training_date
+            FROM `tab{config.detail_doctype}` detail
+            INNER JOIN `tab{attendance_doctype}` meet ON meet.name = detail.parent
+            INNER JOIN `tab{config.member_doctype}` member ON member.name = detail.`{config.member_field}`
+            WHERE detail.parenttype = %(attendance_doctype)s
+                AND detail.parentfield = 'attendance_list'
+                AND meet.docstatus = 1
+                AND meet.meet_date BETWEEN %(from_date)s AND %(to_date)s
+                AND detail.`{config.member_field}` > %(last_member)s
+            ORDER BY member.name
+            LIMIT %(chunk_size)s
+        """, {
+            "attendance_doctype": attendance_doctype,
+            "from_date": getdate(from_date),
+            "to_date": getdate(to_date),
+            "last_member": last_member,
+            "chunk_size": chunk_size
+        }, as_dict=True)
+
+        for row in chunk:
+            yield [row.member, row.mobile_number, row.last_training_date]
+
+        if len(chunk) < chunk_size:
+            break
+        last_member = chunk[-1].member
+
+
+def count_member_dump_rows(attendance_doctype, from_date, to_date):
+    """
+    Returns the number of members a member dump of the date range will list.
+    """
+    config = ATTENDANCE_DOCTYPES[attendance_doctype]
+    return frappe.db.sql(f"""
+        SELECT COUNT(DISTINCT detail.`{config.member_field}`)
+        FROM `tab{config.detail_doctype}` detail
+        INNER JOIN `tab{attendance_doctype}` meet ON meet.name = detail.parent
+        WHERE detail.parenttype = %(attendance_doctype)s
+            AND detail.parentfield = 'attendance_list'
+            AND meet.docstatus = 1
+            AND meet.meet_date BETWEEN %(from_date)s AND %(to_date)s
+    """, {
+        "attendance_doctype": attendance_doctype,
+        "from_date": getdate(from_date),
+        "to_date": getdate(to_date)
+    })[0][0]
+
+
+def count_meet_rows(attendance_doctype, from_date, to_date):
+    """
+    Returns the number of participant rows a meet export of the date range will write.
+    """
+    config = ATTENDANCE_DOCTYPES[attendance_doctype]
+    return frappe.db.sql(f"""
+        SELECT COUNT(*)
+        FROM `tab{config.detail_doctype}` detail
+        INNER JOIN `tab{attendance_doctype}` meet ON meet.name = detail.parent
+        WHERE detail.parenttype = %(attendance_doctype)s
+            AND detail.parentfield = 'attendance_list'
+            AND meet.docstatus = 1
+            AND meet.meet_date BETWEEN %(from_date)s AND %(to_date)s
+    """, {
+        "attendance_doctype": attendance_doctype,
+        "from_date": getdate(from_date),
+        "to_date": getdate(to_date)
+    })[0][0]
+
+
+def iter_meet_rows(attendance_doctype, from_date, to_date, chunk_size=CHUNK_SIZE):
+    """
+    Yields one export row per participant of the submitted meets in the date range.
+    """
+    yield from iter_joined_meet_rows(
+        attendance_doctype,
+        "meet.meet_date BETWEEN %(from_date)s AND %(to_date)s",
+        {"from_date": getdate(from_date), "to_date": getdate(to_date)},
+        chunk_size
+    )
+
+
+def iter_single_meet_rows(attendance_doc, chunk_size=CHUNK_SIZE):
+    """
+    Yields one export row per participant of a single submitted attendance document.
+    """
+    yield from iter_joined_meet_rows(
+        attendance_doc.doctype,
+        "meet.name = %(meet)s",
+        {"meet": attendance_doc.name},
+        chunk_size
+    )
+
+
+def iter_joined_meet_rows(attendance_doctype, condition, values, chunk_size):
+    """
+    Reads meet header fields, attendance rows, venue names and member names in one joined query per chunk,
+    paginated on the meet and attendance row position, so the number of queries depends only on the row count.
+    """
+    config = ATTENDANCE_DOCTYPES[attendance_doctype]
+    last_meet, last_idx = "", 0
+
+    while True:
+        chunk = frappe.db.sql(f"""
+            SELECT
+                meet.name AS meet,
+                detail.idx,
+                meet.`{config.meet_name_field}` AS meet_name,
+                meet.`{config.meet_id_field}` AS meet_id,
+                COALESCE(venue.meet_venue_name, meet.meet_venue) AS meet_venue,
+                meet.meet_date,
+                meet.meet_facilitator,
+                detail.`{config.member_field}` AS member,
+                COALESCE(member.`{config.member_title_field}`, detail.`{config.member_field}`) AS member_title,
+                detail.mobile_number,
+                detail.gift_one,
+                detail.gift_two
+            FROM `tab{config.detail_doctype}` detail
+            INNER JOIN `tab{attendance_doctype}` meet ON meet.name = detail.parent
+            LEFT JOIN `tabMeet Venue` venue ON venue.name = meet.meet_venue
+            LEFT JOIN `tab{config.member_doctype}` member ON member.name = detail.`{config.member_field}`
+            WHERE detail.parenttype = %(attendance_doctype)s
+                AND detail.parentfield = 'attendance_list'
+                AND meet.docstatus = 1
+                AND {condition}
+                AND (detail.parent > %(last_meet)s OR (detail.parent = %(last_meet)s AND detail.idx > %(last_idx)s))
+            ORDER BY detail.parent, detail.idx
+            LIMIT %(chunk_size)s
+        """, dict(
+            values,
+            attendance_doctype=attendance_doctype,
+            last_meet=last_meet,
+            last_idx=last_idx,
+            chunk_size=chunk_size
+        ), as_dict=True)
+
+        for row in chunk:
+            yield [
+                row.meet_name, row.meet_id, row.meet_venue, row.meet_date, row.meet_facilitator,
+                row.member, row.member_title, row.mobile_number, row.gift_one, row.gift_two
+            ]
+
+        if len(chunk) < chunk_size:
+            break
+        last_meet, last_idx = chunk[-1].meet, chunk[-1].idx
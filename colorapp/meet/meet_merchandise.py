@@ -0,0 +1,211 @@
+# Copyright (c) 2024, Victor Mandela and contributors
+# For license information, please see license.txt
+
+import frappe
+from frappe import _
+from frappe.model.document import Document
+from collections import defaultdict
+from frappe.utils import get_datetime, get_time, getdate, now_datetime
+from colorapp.merchandise.stock_ledger import get_bin_balances
+from colorapp.meet.post_submit import enqueue_post_submit
+
+class MeetMerchandiseController(Document):
+    """
+    Gift and training supply issuance shared by the meet attendance doctypes.
+    Submitting checks the stock and saves the per-item consumption summary, the Merchandise Issue itself is
+    posted by the post-submit pipeline from the warehouse of the user who submits.
+    """
+    # Fields of the attendance rows that differ between the attendance doctypes
+    gift_issued_field = 'gift_issued'
+    member_field = 'member_name'
+
+    def validate(self):
+        # Ensure the gifts are valid before submission and automatically update gift_issued status
+        self.validate_and_update_gifts()
+
+        # Ensure training supplies are valid
+        self.validate_training_supplies()
+
+    def validate_and_update_gifts(self):
+        """
+        Ensure that if a gift is issued, the respective quantities are set correctly.
+        Also ensure that gift_one and gift_two are not the same on the same row.
+        Automatically update the gift issued status based on whether gifts have been provided.
+        """
+        for entry in self.attendance_list:
+            # Update the gift issued status based on the gift fields, a gift without a quantity is reported below
+            if entry.gift_one or entry.gift_two:
+                entry.set(self.gift_issued_field, 'Yes')
+            else:
+                entry.set(self.gift_issued_field, 'No')
+
+            member = entry.get(self.member_field)
+            if entry.get(self.gift_issued_field) == 'Yes':
+                # Ensure that gift_one and gift_two are not the same
+                if entry.gift_one and entry.gift_two and entry.gift_one == entry.gift_two:
+                    frappe.throw(_("Gift One and Gift Two cannot be the same for {0}".format(member)))
+
+                # Validate quantities for gifts if they are filled
+                if entry.gift_one and entry.qty <= 0:
+                    frappe.throw(_("Please specify the quantity for Gift One for {0}".format(member)))
+                
+                if entry.gift_two and entry.qnty <= 0:
+                    frappe.throw(_("Please specify the quantity for Gift Two for {0}".format(member)))
+            else:
+                # If no gift is issued, quantities without a gift are not issued
+                entry.qty = 0
+                entry.qnty = 0
+
+    def validate_training_supplies(self):
+        """
+        Ensure that training supplies are valid before submission.
+        - Quantity must be greater than 0 for each entry.
+        - No duplicate items should be added.
+        """
+        seen_items = []
+        for supply in self.training_supplies:
+            if not supply.training_supply_name:
+                frappe.throw(_("Please select a supply item in the Training Supplies table."))
+
+            if supply.training_supply_name in seen_items:
+                frappe.throw(_("Item {0} is already added in the Training Supplies table. Please remove the duplicate entry.".format(supply.training_supply_name)))
+
+            if supply.quantity <= 0:
+                frappe.throw(_("Please enter a valid quantity for item {0}. Quantity cannot be zero or negative.".format(supply.training_supply_name)))
+
+            seen_items.append(supply.training_supply_name)
+
+    def before_submit(self):
+        consumption_summary = self.get_consumption_summary()
+        if consumption_summary:
+            # Check the stock of the submitting user's warehouse now, the issue itself is posted after submit
+            self.set_user_merchandise_warehouse()
+            self.validate_stock_availability()
+
+            # The issue is posted at submit time, also when the background job runs or is retried later
+            self.merchandise_posting_datetime = now_datetime()
+
+        # Update the Meet Merchandise Issue Detail table with the summarized consumption
+        self.update_merchandise_consumption(consumption_summary)
+
+    def set_user_merchandise_warehouse(self):
+        """
+        Sets the merchandise warehouse of the session user, which is only needed when merchandise is issued.
+        """
+        if not self.user_merchandise_warehouse:
+            self.user_merchandise_warehouse = frappe.db.get_value("User", frappe.session.user, "merchandise_warehouse")
+            if not self.user_merchandise_warehouse:
+                frappe.throw(_("You are not assigned a Merchandise Warehouse"))
+
+    def on_submit(self):
+        # Issue the merchandise and run the other post-submit steps of the doctype in the background
+        enqueue_post_submit(self)
+        frappe.msgprint(_("The merchandise issue is being processed in the background."))
+
+    @frappe.whitelist()
+    def retry_post_submit(self):
+        """
+        Queues the failed post-submit steps again, completed steps are not repeated.
+        """
+        self.check_permission("submit")
+        if self.docstatus != 1 or self.post_submit_status != "Failed":
+            frappe.throw(_("Only submitted attendance with failed post-submit processing can be retried"))
+
+        enqueue_post_submit(self)
+
+    def get_issue_lines(self):
+        """
+        Returns (item, quantity) for each gift issued to an attendee and each training supply.
+        """
+        issue_lines = []
+
+        # Iterate over the attendance list and process issued gifts
+        for entry in self.attendance_list:
+            if entry.get(self.gift_issued_field) == 'Yes':
+                # Process Gift One
+                if entry.gift_one and entry.qty > 0:
+                    issue_lines.append((entry.gift_one, entry.qty))
+
+                # Process Gift Two
+                if entry.gift_two and entry.qnty > 0:
+                    issue_lines.append((entry.gift_two, entry.qnty))
+
+        # Process Training Supplies
+        for supply in self.training_supplies:
+            if supply.training_supply_name and supply.quantity > 0:
+                issue_lines.append((supply.training_supply_name, supply.quantity))
+
+        return issue_lines
+
+    def get_consumption_summary(self):
+        """
+        Returns the total quantity issued per item.
+        """
+        consumption_summary = defaultdict(float)
+        for item, quantity in self.get_issue_lines():
+            consumption_summary[item] += quantity
+        return consumption_summary
+
+    def validate_stock_availability(self):
+        """
+        Checks the warehouse holds enough of every item issued, with one balance query.
+        """
+        consumption_summary = self.get_consumption_summary()
+        balances = get_bin_balances([(item, self.user_merchandise_warehouse) for item in consumption_summary])
+
+        for item, quantity in consumption_summary.items():
+            available_qty = balances[(item, self.user_merchandise_warehouse)]
+            if available_qty < quantity:
+                frappe.throw(_("Insufficient stock for {0} in {1}. Available: {2}, Required: {3}").format(
+                    item, self.user_merchandise_warehouse, available_qty, quantity))
+
+    def make_merchandise_entry(self):
+        """
+        Returns a Merchandise Entry of type Issue for the gifts and training supplies, or None if nothing was issued.
+        The entry has one line per item with the total issued, so the meet posts one ledger row per item.
+        What each attendee received stays on the attendance list, linked to the entry through its reference.
+        """
+        merchandise_entry = None
+        for item, quantity in self.get_consumption_summary().items():
+            if not merchandise_entry:
+                merchandise_entry = self.create_merchandise_entry()
+            self.add_gift_to_merchandise_entry(merchandise_entry, item, quantity)
+        return merchandise_entry
+
+    def create_merchandise_entry(self):
+        """
+        Create a Merchandise Entry document for type Issue, linked to the session user's warehouse.
+        """
+        # Attendance submitted before the posting time was stored falls back to its last update
+        posting_datetime = get_datetime(self.merchandise_posting_datetime or self.modified)
+        return frappe.get_doc({
+            'doctype': 'Merchandise Entry',
+            'merchandise_entry_type': 'Merchandise Issue',
+            'posting_date': getdate(posting_datetime),
+            'posting_time': get_time(posting_datetime),
+            'source_warehouse': self.user_merchandise_warehouse,  # Fetch warehouse from session user
+            'merchandise_entry_description': f"Gifts and supplies issued during the {self.doctype.replace(' Attendance', '')} {self.name}",
+            'reference_doctype': self.doctype,  # Links the issue to this attendance, so it is posted only once
+            'reference_name': self.name
+        })
+
+    def add_gift_to_merchandise_entry(self, merchandise_entry, gift, quantity):
+        """
+        Add each gift issued to the merchandise entry.
+        """
+        merchandise_entry.append('merchandise_items', {
+            'merchandise_item_code': gift,
+            'quantity': quantity
+        })
+
+    def update_merchandise_consumption(self, consumption_summary):
+        """
+        Update the Meet Merchandise Issue Detail table with summarized merchandise consumption.
+        """
+        self.merchandise_consumption = []  # Clear previous entries
+
+        for item_name, consumed_quantity in consumption_summary.items():
+            self.append('merchandise_consumption', {
+                'merchandise_item_name': item_name,
+                'consumed_quantity': consumed_quantity
+            })
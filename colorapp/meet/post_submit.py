@@ -0,0 +1,109 @@
+# Copyright (c) 2024, Victor Mandela and contributors
+# For license information, please see license.txt
+
+import frappe
+from frappe import _
+from colorapp.api import map_skills_and_products_to_members
+
+# Status field of each step per attendance doctype, steps run in this order
+POST_SUBMIT_STEPS = {
+    "Painters Meet Attendance": ["stock_issue_status", "meet_plan_status", "member_mapping_status"],
+    # The Counter Staff Meet Plan is still updated by the on_submit hook of the attendance
+    "Counter Staff Meet Attendance": ["stock_issue_status"]
+}
+
+
+def enqueue_post_submit(doc):
+    """
+    Queues the post-submit pipeline of a submitted meet attendance. The job starts after the submit commits.
+    """
+    doc.db_set("post_submit_status", "Queued", update_modified=False)
+    frappe.enqueue(
+        run_post_submit,
+        queue="long",
+        timeout=3600,
+        job_id=f"{frappe.scrub(doc.doctype)}_post_submit::{doc.name}",
+        deduplicate=True,
+        enqueue_after_commit=True,
+        attendance_name=doc.name,
+        attendance_doctype=doc.doctype
+    )
+
+
+def run_post_submit(attendance_name, attendance_doctype="Painters Meet Attendance"):
+    """
+    Runs the pending steps of the post-submit pipeline of the doctype: issuing the gifts and supplies from stock
+    and, for the Painters Meet Attendance, marking the meet plan executed and mapping skills and products to the
+    attendees. Each step commits with its status, so a failed run can be retried and resumes at the failed step
+    without repeating the others.
+    """
+    doc = frappe.get_doc(attendance_doctype, attendance_name)
+    if doc.docstatus != 1:
+        return
+
+    doc.db_set({"post_submit_status": "Running", "post_submit_error": None}, update_modified=False, commit=True)
+
+    steps = {
+        "stock_issue_status": issue_merchandise,
+        "meet_plan_status": mark_meet_plan_executed,
+        "member_mapping_status": map_attendees
+    }
+
+    for status_field in POST_SUBMIT_STEPS[doc.doctype]:
+        if doc.get(status_field) == "Completed":
+            continue
+
+        try:
+            steps[status_field](doc)
+            doc.db_set(status_field, "Completed", update_modified=False)
+            frappe.db.commit()
+        except Exception:
+            frappe.db.rollback()
+            doc.db_set({
+                status_field: "Failed",
+                "post_submit_status": "Failed",
+                "post_submit_error": frappe.get_traceback()
+            }, update_modified=False, commit=True)
+            doc.log_error(_("{0} post-submit processing failed").format(doc.doctype))
+            doc.notify_update()
+            return
+
+    doc.db_set("post_submit_status", "Completed", update_modified=False, commit=True)
+    doc.notify_update()
+
+
+def issue_merchandise(doc):
+    """
+    Submits the Merchandise Issue of the attendance once. An issue already submitted for the attendance
+    is reused, so retries never post the stock twice.
+    """
+    merchandise_entry = frappe.db.get_value("Merchandise Entry", {
+        "reference_doctype": doc.doctype,
+        "reference_name": doc.name,
+        "docstatus": 1
+    })
+
+    if not merchandise_entry:
+        entry = doc.make_merchandise_entry()
+        if not entry:
+            return
+        entry.submit()
+        merchandise_entry = entry.name
+
+    doc.db_set("merchandise_entry", merchandise_entry, update_modified=False)
+
+
+def mark_meet_plan_executed(doc):
+    """
+    Sets the execution status of the Painters Meet Plan of the attendance to Executed.
+    """
+    if doc.meet_id:
+        frappe.get_doc("Painters Meet Plan", doc.meet_id).db_set("execution_status", "Executed")
+
+
+def map_attendees(doc):
+    """
+    Maps the skills and products of the meet to the attendees' Colour App Member profiles.
+    """
+    if doc.meet_id:
+        map_skills_and_products_to_members(doc)
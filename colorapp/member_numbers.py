@@ -0,0 +1,97 @@
+# Copyright (c) 2024, Victor Mandela and contributors
+# For license information, please see license.txt
+
+import hashlib
+import frappe
+from frappe.utils import cint
+
+# Member app numbers are 8 digits, from 10000000 to 99999999
+FIRST_NUMBER = 10000000
+NUMBER_COUNT = 90000000
+
+# Series row counting the member app numbers issued, shared by all member doctypes
+SERIES_KEY = "MEMBER-APP-NUMBER"
+
+# The permutation works on pairs of digits in base HALF_SIZE, HALF_SIZE ** 2 >= NUMBER_COUNT.
+# Changing HALF_SIZE, ROUNDS or ROUND_KEY after numbers were issued would reissue them.
+HALF_SIZE = 9487
+ROUNDS = 4
+ROUND_KEY = "colorapp-member-app-number"
+
+
+def allocate_member_numbers(doctype, count=1):
+    """
+    Returns count unused member app numbers for members of the doctype.
+    A block of count positions is reserved from a sequence, and each position is mapped to a number by a
+    fixed permutation, so numbers are unique without retries and do not reveal how many members exist.
+    Blocks are reserved in their own short transaction, so concurrent inserts and long imports do not wait on
+    each other until commit. A block reserved by a transaction that rolls back is not reused, which leaves gaps
+    in the sequence but never issues a number twice.
+    """
+    numbers = []
+    while len(numbers) < count:
+        candidates = [str(FIRST_NUMBER + permute(position)) for position in reserve_positions(count - len(numbers))]
+
+        # Numbers issued before the allocator were random and may fall in the block, skip them
+        taken = set(frappe.get_all(doctype, filters={"member_app_number": ["in", candidates]}, pluck="member_app_number"))
+        numbers.extend(number for number in candidates if number not in taken)
+
+    return numbers
+
+
+def reserve_positions(count):
+    """
+    Reserves the next count positions of the member app number sequence and returns them.
+    The reservation runs and commits on a separate connection, so the series row is only locked for the
+    reservation itself and not until the caller's transaction commits.
+    """
+    db = frappe.database.get_db(
+        host=frappe.conf.db_host,
+        port=frappe.conf.db_port,
+        user=frappe.conf.db_user or frappe.conf.db_name,
+        password=frappe.conf.db_password,
+        cur_db_name=frappe.conf.db_name
+    )
+    db.connect()
+    try:
+        # One statement creates or advances the row, so concurrent first allocations cannot both insert it.
+        # The row stays locked by the write, the read below sees this transaction's value.
+        db.sql("""
+            INSERT INTO `tabSeries` (`name`, `current`) VALUES (%(name)s, %(count)s)
+            ON DUPLICATE KEY UPDATE `current` = IFNULL(`current`, 0) + %(count)s
+        """, {"name": SERIES_KEY, "count": count})
+        start = cint(db.sql("SELECT `current` FROM `tabSeries` WHERE `name` = %s FOR UPDATE", SERIES_KEY)[0][0]) - count
+
+        if start + count > NUMBER_COUNT:
+            db.rollback()
+            frappe.throw("All member app numbers have been issued.")
+
+        db.commit()
+    finally:
+        db.close()
+
+    return range(start, start + count)
+
+
+def permute(position):
+    """
+    Maps a sequence position in [0, NUMBER_COUNT) to a distinct value in the same range.
+    A Feistel network is a bijection on [0, HALF_SIZE ** 2), values outside the range are permuted again
+    until they fall inside it, which keeps the mapping a bijection on the range.
+    """
+    value = feistel(position)
+    while value >= NUMBER_COUNT:
+        value = feistel(value)
+    return value
+
+
+def feistel(value):
+    left, right = divmod(value, HALF_SIZE)
+    for round_number in range(ROUNDS):
+        left, right = right, (left + round_function(round_number, right)) % HALF_SIZE
+    return left * HALF_SIZE + right
+
+
+def round_function(round_number, value):
+    digest = hashlib.blake2b(f"{ROUND_KEY}:{round_number}:{value}".encode(), digest_size=8).digest()
+    return int.from_bytes(digest, "big")
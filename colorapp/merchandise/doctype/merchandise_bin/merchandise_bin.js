@@ -0,0 +1,8 @@
+// Copyright (c) 2024, Victor Mandela and contributors
+// For license information, please see license.txt
+
+// frappe.ui.form.on("Merchandise Bin", {
+// 	refresh(frm) {
+
+// 	},
+// });
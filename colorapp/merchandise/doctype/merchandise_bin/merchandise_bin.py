@@ -0,0 +1,83 @@
+# Copyright (c) 2024, Victor Mandela and contributors
+# For license information, please see license.txt
+
+import frappe
+from frappe.model.document import Document
+from frappe.utils import flt
+
+
+class MerchandiseBin(Document):
+    pass
+
+
+def on_doctype_update():
+    # One bin per item and warehouse, this index also serves the balance lookups
+    frappe.db.add_unique(
+        "Merchandise Bin",
+        ["merchandise_item_code", "merchandise_warehouse"],
+        constraint_name="unique_item_warehouse"
+    )
+
+
+def get_bin_qty(item_code, warehouse):
+    """
+    Returns the current balance of an item in a warehouse from its Merchandise Bin.
+    """
+    balance = frappe.db.get_value(
+        "Merchandise Bin",
+        {"merchandise_item_code": item_code, "merchandise_warehouse": warehouse},
+        "balance_quantity"
+    )
+    return flt(balance)
+
+
+def get_or_make_bin(item_code, warehouse):
+    """
+    Returns the name of the Merchandise Bin for the item and warehouse, creating it if it does not exist yet.
+    """
+    filters = {"merchandise_item_code": item_code, "merchandise_warehouse": warehouse}
+    bin_name = frappe.db.get_value("Merchandise Bin", filters)
+    if bin_name:
+        return bin_name
+
+    bin_doc = frappe.get_doc({
+        "doctype": "Merchandise Bin",
+        "merchandise_item_code": item_code,
+        "merchandise_warehouse": warehouse,
+        "balance_quantity": 0
+    })
+    try:
+        bin_doc.insert(ignore_permissions=True)
+    except frappe.UniqueValidationError:
+        # Another transaction created the bin in the meantime, a locking read sees it
+        return frappe.db.get_value("Merchandise Bin", filters, for_update=True)
+
+    return bin_doc.name
+
+
+def make_bins(item_warehouse_pairs):
+    """
+    Returns {(item_code, warehouse): bin name} for all the pairs, creating the missing bins.
+    """
+    pairs = set(item_warehouse_pairs)
+    if not pairs:
+        return {}
+
+    existing_bins = frappe.get_all(
+        "Merchandise Bin",
+        filters={
+            "merchandise_item_code": ["in", list({item_code for item_code, warehouse in pairs})],
+            "merchandise_warehouse": ["in", list({warehouse for item_code, warehouse in pairs})]
+        },
+        fields=["name", "merchandise_item_code", "merchandise_warehouse"]
+    )
+    bin_names = {
+        (item_bin.merchandise_item_code, item_bin.merchandise_warehouse): item_bin.name
+        for item_bin in existing_bins
+        if (item_bin.merchandise_item_code, item_bin.merchandise_warehouse) in pairs
+    }
+
+    for item_code, warehouse in sorted(pairs - set(bin_names)):
+        bin_names[(item_code, warehouse)] = get_or_make_bin(item_code, warehouse)
+
+    return bin_names
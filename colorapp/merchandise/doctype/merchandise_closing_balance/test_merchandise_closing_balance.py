@@ -0,0 +1,9 @@
+# Copyright (c) 2024, Victor Mandela and Contributors
+# See license.txt
+
+# import frappe
+from frappe.tests.utils import FrappeTestCase
+
+
+class TestMerchandiseClosingBalance(FrappeTestCase):
+	pass
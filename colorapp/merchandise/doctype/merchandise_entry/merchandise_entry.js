@@ -81,24 +81,52 @@ frappe.ui.form.on('Merchandise Entry Detail', {
         // Only fetch stock balance for Issue or Transfer
         if (frm.doc.merchandise_entry_type === "Merchandise Issue" || frm.doc.merchandise_entry_type === "Merchandise Transfer") {
             if (frm.doc.source_warehouse && row.merchandise_item_code) {
-                frappe.call({
-                    method: "colorapp.api.get_item_balance",  // Calls server-side function
-                    args: {
-                        "item_code": row.merchandise_item_code,
-                        "warehouse": frm.doc.source_warehouse
-                    },
-                    callback: function(response) {
-                        if (response.message) {
-                            let balance = response.message;
-                            frappe.model.set_value(cdt, cdn, "quantity", balance);  // Set balance in quantity field
-                            frappe.show_alert({
-                                message: `Available stock for ${row.merchandise_item_code} in ${frm.doc.source_warehouse}: ${balance}`,
-                                indicator: 'blue'
-                            });
-                        }
-                    }
-                });
+                // Rows changed together, e.g. when pasting lines, are fetched in one request
+                frm.pending_balance_rows = frm.pending_balance_rows || new Set();
+                frm.pending_balance_rows.add(cdn);
+                clearTimeout(frm.pending_balance_timeout);
+                frm.pending_balance_timeout = setTimeout(() => set_item_balances(frm, cdt), 100);
             }
         }
     }
 });
+
+function set_item_balances(frm, cdt) {
+    let warehouse = frm.doc.source_warehouse;
+    let rows = Array.from(frm.pending_balance_rows || [])
+        .map(cdn => locals[cdt][cdn])
+        .filter(row => row && row.merchandise_item_code);
+    frm.pending_balance_rows = new Set();
+
+    if (!rows.length || !warehouse) {
+        return;
+    }
+
+    frappe.call({
+        method: "colorapp.api.get_item_balances",  // Calls server-side function
+        args: {
+            "pairs": rows.map(row => [row.merchandise_item_code, warehouse])
+        },
+        callback: function(response) {
+            let balances = (response.message || {})[warehouse] || {};
+            let updated_rows = rows.filter(row => balances[row.merchandise_item_code]);
+
+            updated_rows.forEach(row => {
+                frappe.model.set_value(cdt, row.name, "quantity", balances[row.merchandise_item_code]);  // Set balance in quantity field
+            });
+
+            if (updated_rows.length === 1) {
+                let item_code = updated_rows[0].merchandise_item_code;
+                frappe.show_alert({
+                    message: `Available stock for ${item_code} in ${warehouse}: ${balances[item_code]}`,
+                    indicator: 'blue'
+                });
+            } else if (updated_rows.length > 1) {
+                frappe.show_alert({
+                    message: `Available stock set for ${updated_rows.length} items in ${warehouse}`,
+                    indicator: 'blue'
+                });
+            }
+        }
+    });
+}
@@ -4,7 +4,12 @@
 import frappe
 from frappe import _
 from frappe.model.document import Document
-from frappe.utils import now_datetime
+from frappe.utils import flt, get_datetime, getdate, now_datetime, nowtime, today
+from collections import defaultdict
+from colorapp.merchandise.doctype.merchandise_bin.merchandise_bin import get_bin_qty
+from colorapp.merchandise.stock_ledger import get_bin_balances, make_ledger_entries
+from colorapp.merchandise.stock_alerts import update_stock_alerts
+from colorapp.merchandise.period_closing import get_latest_closing
 
 class MerchandiseEntry(Document):
 
@@ -22,6 +27,16 @@ class MerchandiseEntry(Document):
             if self.source_warehouse == self.target_warehouse:
                 frappe.throw(_("Source and Target Warehouse cannot be the same for Merchandise Transfer"))
 
+        # Ledger rows are ordered by the posting date and time of the entry
+        if not self.posting_date:
+            self.posting_date = today()
+        if not self.posting_time:
+            self.posting_time = nowtime()
+        self.posting_datetime = get_datetime(f"{getdate(self.posting_date)} {self.posting_time}")
+
+        # Closed periods cannot receive new postings
+        self.validate_posting_after_closing()
+
         # Validate stock availability for Issue and Transfer
         if self.merchandise_entry_type in ["Merchandise Issue", "Merchandise Transfer"]:
             self.validate_stock_levels()
@@ -33,135 +48,93 @@ class MerchandiseEntry(Document):
             if item.quantity <= 0:
                 frappe.throw(_("Quantity must be greater than zero"))
 
+    def validate_posting_after_closing(self):
+        """
+        Rejects a posting date on or before the latest period closing, whose balances are snapshotted.
+        """
+        latest_closing = get_latest_closing()
+        if latest_closing and self.posting_date and getdate(self.posting_date) <= getdate(latest_closing.closing_date):
+            frappe.throw(_("Posting Date must be after the period closing {0} on {1}").format(
+                latest_closing.name, latest_closing.closing_date))
+
     def validate_stock_levels(self):
         """
         This function checks if the available stock is sufficient in the source warehouse 
-        before allowing Issue or Transfer.
+        before allowing Issue or Transfer. Balances for all items are fetched in one query.
         """
+        required_qty = defaultdict(float)
+        item_names = {}
         for item in self.merchandise_items:
-            available_qty = self.get_item_balance(item.merchandise_item_code, self.source_warehouse)
-            if available_qty < item.quantity:
+            required_qty[item.merchandise_item_code] += flt(item.quantity)
+            item_names[item.merchandise_item_code] = item.merchandise_item_name or item.merchandise_item_code
+
+        balances = get_bin_balances([(item_code, self.source_warehouse) for item_code in required_qty])
+
+        for item_code, qty in required_qty.items():
+            available_qty = balances[(item_code, self.source_warehouse)]
+            if available_qty < qty:
                 frappe.throw(_(
                     "Insufficient stock for {0} in {1}. Available: {2}, Required: {3}"
-                ).format(item.merchandise_item_name, self.source_warehouse, available_qty, item.quantity))
+                ).format(item_names[item_code], self.source_warehouse, available_qty, qty))
 
     def get_item_balance(self, item_code, warehouse):
         """
-        Fetches the latest stock balance from the Merchandise Ledger for a given item and warehouse.
+        Fetches the current stock balance of an item in a warehouse from its Merchandise Bin.
         """
-        last_entry = frappe.db.get_value("Merchandise Ledger", 
-            {"merchandise_item_code": item_code, "merchandise_warehouse": warehouse}, 
-            "balance_after", order_by="posting_datetime desc"
-        )
-        return last_entry or 0  # Return 0 if no previous stock entry is found
+        return get_bin_qty(item_code, warehouse)
 
     def on_submit(self):
         # Handle stock ledger updates on submit based on merchandise entry type
         self.update_stock_ledger()
 
+    def before_cancel(self):
+        # Cancelling posts reversing rows at the original posting date, which must not be in a closed period
+        self.validate_posting_after_closing()
+
     def on_cancel(self):
         # Reverse the stock ledger when cancelling
         self.update_stock_ledger(cancel=True)
 
     def update_stock_ledger(self, cancel=False):
         multiplier = -1 if cancel else 1
+        ledger_rows = []
         for item in self.merchandise_items:
             if self.merchandise_entry_type == "Merchandise Receipt":
-                self.create_ledger_entry(item, self.target_warehouse, multiplier, cancel)
+                ledger_rows.append(self.get_ledger_row(item, self.target_warehouse, multiplier, cancel))
             elif self.merchandise_entry_type == "Merchandise Issue":
-                self.create_ledger_entry(item, self.source_warehouse, -multiplier, cancel)
+                ledger_rows.append(self.get_ledger_row(item, self.source_warehouse, -multiplier, cancel))
             elif self.merchandise_entry_type == "Merchandise Transfer":
                 # Remove from source and add to target warehouse
-                self.create_ledger_entry(item, self.source_warehouse, -multiplier, cancel)
-                self.create_ledger_entry(item, self.target_warehouse, multiplier, cancel)
+                ledger_rows.append(self.get_ledger_row(item, self.source_warehouse, -multiplier, cancel))
+                ledger_rows.append(self.get_ledger_row(item, self.target_warehouse, multiplier, cancel))
 
-    def create_ledger_entry(self, item, warehouse, multiplier, cancel):
-        qty = item.quantity * multiplier
-        balance_qty = self.get_item_balance(item.merchandise_item_code, warehouse) + qty
+        # Post all rows in one batch, bins and warehouses are updated once per submit
+        balances = make_ledger_entries(ledger_rows)
 
-        # Create a Merchandise Ledger entry
-        ledger_entry = frappe.get_doc({
-            "doctype": "Merchandise Ledger",
+        # Check stock level alerts against the balances after posting
+        self.check_stock_levels_after_transaction(balances)
+
+    def get_ledger_row(self, item, warehouse, multiplier, cancel):
+        """
+        Returns the Merchandise Ledger fields for one item movement in a warehouse.
+        """
+        return {
             "merchandise_item_code": item.merchandise_item_code,
+            "merchandise_item_name": item.merchandise_item_name,
             "merchandise_warehouse": warehouse,
             "posting_date": self.posting_date,
             "posting_time": self.posting_time,
-            "posting_datetime": frappe.utils.now(),
-            "quantity": qty,
-            "balance_after": balance_qty,
+            "posting_datetime": self.posting_datetime,
+            "quantity": item.quantity * multiplier,
             "transaction_type": self.merchandise_entry_type,
             "reference_doc_name": self.name,
             "transaction_remarks": self.merchandise_entry_description or f"{self.merchandise_entry_type}",
             "is_cancelled": 1 if cancel else 0  # Use the passed cancel variable here
-        })
-        ledger_entry.insert()
-
-        # After updating the ledger, update the warehouse balances and check for stock level alerts
-        self.update_warehouse_merchandise_item(item, warehouse, qty)
-
-    def update_warehouse_merchandise_item(self, item, warehouse, qty):
-        """
-        Updates the balance_quantity in the Warehouse Merchandise Detail child table
-        in the Merchandise Warehouse Doctype based on stock movement (issue, transfer, receipt).
-        """
-        warehouse_doc = frappe.get_doc("Merchandise Warehouse", warehouse)
-        found = False
-
-        for detail in warehouse_doc.merchandise_warehouse_item:
-            if detail.merchandise_item_code == item.merchandise_item_code:
-                # Update the balance quantity
-                detail.balance_quantity += qty
-                found = True
-                # Check stock level after transaction
-                self.check_stock_level_after_transaction(item.merchandise_item_code, detail.balance_quantity, warehouse)
-                break
-
-        if not found and qty > 0:
-            warehouse_doc.append("merchandise_warehouse_item", {
-                "merchandise_item_code": item.merchandise_item_code,
-                "merchandise_item_name": item.merchandise_item_name,
-                "balance_quantity": qty
-            })
-
-        warehouse_doc.save()
-
-    def check_stock_level_after_transaction(self, item_code, balance_quantity, warehouse):
-        """
-        Checks if the stock level of an item falls below the minimum stock level after the transaction.
-        If it does, it triggers a system notification and optionally an email notification.
-        """
-        merchandise_item = frappe.get_doc("Merchandise Item", item_code)
-
-        if balance_quantity < merchandise_item.minimum_stock_level:
-            warehouse_doc = frappe.get_doc("Merchandise Warehouse", warehouse)
-            user = frappe.db.get_value("User", {"merchandise_warehouse": warehouse_doc.name}, "email")
-
-            # Create a system notification
-            self.create_system_notification(user, merchandise_item, balance_quantity, warehouse)
+        }
 
-    def create_system_notification(self, user, merchandise_item, balance_quantity, warehouse):
+    def check_stock_levels_after_transaction(self, balances):
         """
-        Creates a system notification for the user when stock falls below the minimum level.
+        Raises or updates a low-stock alert for every posted item that is below its minimum stock level
+        after the transaction, and resolves the alerts of items back above it. Alerts are sent as a digest.
         """
-        # Corrected field name to 'merchandise_item_name'
-        message = (f"Stock for item {merchandise_item.merchandise_item_name} in warehouse {warehouse} is below the minimum level. "
-                f"Current balance: {balance_quantity}. Please reorder or create a merchandise request.")
-
-        # Notification content
-        notification = frappe.get_doc({
-            "doctype": "Notification Log",
-            "subject": f"Low Stock Alert for {merchandise_item.merchandise_item_name}",
-            "email_content": message,
-            "for_user": user,
-            "document_type": "Merchandise Item",  # Link the notification to the Merchandise Item
-            "document_name": merchandise_item.name  # Link the item in the notification
-        })
-        notification.insert(ignore_permissions=True)
-
-
-        # Optional: send an email (uncomment this when email setup is ready)
-        # frappe.sendmail(
-        #     recipients=[user],
-        #     subject=f"Low Stock Alert for {merchandise_item.item_name}",
-        #     message=message
-        # )
\ No newline at end of file
+        update_stock_alerts(balances)
\ No newline at end of file
@@ -1,9 +1,100 @@
 # Copyright (c) 2024, Victor Mandela and Contributors
 # See license.txt
 
-# import frappe
+import frappe
 from frappe.tests.utils import FrappeTestCase
+from frappe.utils import add_days, now_datetime, nowtime, today
+from colorapp.merchandise.doctype.merchandise_bin.merchandise_bin import get_bin_qty
+from colorapp.merchandise.stock_ledger import make_ledger_entries
+from colorapp.tests.utils import (
+	commit_ledger_row, delete_committed_stock, get_ledger_balances_after, get_second_connection,
+	make_merchandise_entry, make_merchandise_item, make_merchandise_warehouse
+)
 
 
 class TestMerchandiseEntry(FrappeTestCase):
-	pass
+	def setUp(self):
+		self.item_code = make_merchandise_item()
+		self.warehouse = make_merchandise_warehouse()
+
+	def test_posting_updates_ledger_bin_and_warehouse(self):
+		make_merchandise_entry("Merchandise Receipt", self.item_code, 10, target_warehouse=self.warehouse)
+		make_merchandise_entry("Merchandise Issue", self.item_code, 4, source_warehouse=self.warehouse)
+
+		self.assertEqual(get_ledger_balances_after(self.item_code, self.warehouse), [10, 6])
+		self.assertEqual(get_bin_qty(self.item_code, self.warehouse), 6)
+		self.assertEqual(frappe.db.get_value("Warehouse Merchandise Detail", {
+			"parent": self.warehouse,
+			"merchandise_item_code": self.item_code
+		}, "balance_quantity"), 6)
+
+	def test_issue_above_balance_is_rejected(self):
+		make_merchandise_entry("Merchandise Receipt", self.item_code, 5, target_warehouse=self.warehouse)
+
+		self.assertRaises(frappe.ValidationError, make_merchandise_entry,
+			"Merchandise Issue", self.item_code, 6, source_warehouse=self.warehouse)
+		self.assertEqual(get_bin_qty(self.item_code, self.warehouse), 5)
+
+	def test_locked_posting_rechecks_stock(self):
+		# The balance is checked again under the bin lock, a posting validated against an older balance fails
+		make_merchandise_entry("Merchandise Receipt", self.item_code, 5, target_warehouse=self.warehouse)
+
+		self.assertRaises(frappe.ValidationError, make_ledger_entries, [{
+			"merchandise_item_code": self.item_code,
+			"merchandise_item_name": self.item_code,
+			"merchandise_warehouse": self.warehouse,
+			"posting_date": today(),
+			"posting_time": nowtime(),
+			"posting_datetime": now_datetime(),
+			"quantity": -6,
+			"transaction_type": "Merchandise Issue",
+			"reference_doc_name": None,
+			"transaction_remarks": None,
+			"is_cancelled": 0
+		}])
+
+	def test_batch_posts_running_balances_in_order(self):
+		entry = make_merchandise_entry("Merchandise Receipt", self.item_code, 3, target_warehouse=self.warehouse, submit=False)
+		entry.append("merchandise_items", {"merchandise_item_code": self.item_code, "quantity": 4})
+		entry.save()
+		entry.submit()
+
+		self.assertEqual(get_ledger_balances_after(self.item_code, self.warehouse), [3, 7])
+		self.assertEqual(get_bin_qty(self.item_code, self.warehouse), 7)
+
+	def test_cancel_reverses_posting(self):
+		receipt = make_merchandise_entry("Merchandise Receipt", self.item_code, 8, target_warehouse=self.warehouse)
+		issue = make_merchandise_entry("Merchandise Issue", self.item_code, 3, source_warehouse=self.warehouse)
+
+		issue.cancel()
+		self.assertEqual(get_bin_qty(self.item_code, self.warehouse), 8)
+
+		receipt.cancel()
+		self.assertEqual(get_bin_qty(self.item_code, self.warehouse), 0)
+
+	def test_concurrent_later_posting_queues_repost(self):
+		posting_date = add_days(today(), -1)
+		make_merchandise_entry("Merchandise Receipt", self.item_code, 10, target_warehouse=self.warehouse,
+			posting_date=posting_date, posting_time="09:00:00")
+		frappe.db.commit()
+
+		try:
+			# This entry is validated first, which opens its snapshot
+			entry = make_merchandise_entry("Merchandise Receipt", self.item_code, 1, target_warehouse=self.warehouse,
+				posting_date=posting_date, posting_time="10:00:00", submit=False)
+
+			# A later posting of the same pair commits before this entry takes the bin lock
+			second_connection = get_second_connection()
+			commit_ledger_row(second_connection, self.item_code, self.warehouse, 2, f"{posting_date} 12:00:00")
+			second_connection.close()
+
+			entry.submit()
+
+			self.assertTrue(frappe.db.exists("Merchandise Ledger Repost", {
+				"merchandise_item_code": self.item_code,
+				"merchandise_warehouse": self.warehouse,
+				"status": "Queued"
+			}))
+			self.assertEqual(get_bin_qty(self.item_code, self.warehouse), 13)
+		finally:
+			delete_committed_stock(self.item_code, self.warehouse)
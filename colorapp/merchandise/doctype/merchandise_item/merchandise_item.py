@@ -1,9 +1,13 @@
 # Copyright (c) 2024, Victor Mandela and contributors
 # For license information, please see license.txt
 
-# import frappe
 from frappe.model.document import Document
+from colorapp.merchandise.masters import clear_item_master
 
 
 class MerchandiseItem(Document):
-	pass
+	def on_update(self):
+		clear_item_master(self.name)
+
+	def on_trash(self):
+		clear_item_master(self.name)
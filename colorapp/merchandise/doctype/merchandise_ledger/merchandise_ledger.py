@@ -1,31 +1,21 @@
 # Copyright (c) 2024, Victor Mandela and contributors
 # For license information, please see license.txt
 
-import frappe
-from frappe import _
 from frappe.model.document import Document
+from frappe.utils import get_datetime, getdate
+from colorapp.merchandise.stock_ledger import LEDGER_FIELDS, make_ledger_entries
 
 class MerchandiseLedger(Document):
     
     def before_insert(self):
-        # This method is called before inserting a new ledger entry
-        self.update_balance()
+        # Ledger rows are ordered by the posting date and time
+        if not self.posting_datetime and self.posting_date:
+            self.posting_datetime = get_datetime(f"{getdate(self.posting_date)} {self.posting_time or '00:00:00'}")
 
-    def update_balance(self):
-        # Update the balance based on previous ledger entries
-        # Ensure you're using the correct field 'merchandise_item_code' instead of 'merchandise_item'
-        last_entry = frappe.db.get_value(
-            "Merchandise Ledger",
-            {
-                "merchandise_item_code": self.merchandise_item_code,  # Corrected field
-                "merchandise_warehouse": self.merchandise_warehouse
-            },
-            "balance_after"
-        )
-
-        # Set the balance after based on the last entry
-        if last_entry:
-            self.balance_after = last_entry + self.quantity
-        else:
-            # If no previous entry exists, the balance starts with the current quantity
-            self.balance_after = self.quantity
+    def db_insert(self, *args, **kwargs):
+        # Post through the same locked path as Merchandise Entries: the bin is locked, balance_after is computed
+        # from the locked balance, and the bin, warehouse, caches and backdated reposts are updated with the row
+        row = {field: self.get(field) for field in LEDGER_FIELDS}
+        row["name"] = self.name
+        key = (self.merchandise_item_code, self.merchandise_warehouse)
+        self.balance_after = make_ledger_entries([row])[key]
@@ -1,9 +1,33 @@
 # Copyright (c) 2024, Victor Mandela and Contributors
 # See license.txt
 
-# import frappe
+import frappe
 from frappe.tests.utils import FrappeTestCase
+from frappe.utils import nowtime, today
+from colorapp.merchandise.doctype.merchandise_bin.merchandise_bin import get_bin_qty
+from colorapp.tests.utils import make_merchandise_entry, make_merchandise_item, make_merchandise_warehouse
 
 
 class TestMerchandiseLedger(FrappeTestCase):
-	pass
+	def test_inserted_row_posts_through_locked_path(self):
+		item_code = make_merchandise_item()
+		warehouse = make_merchandise_warehouse()
+		make_merchandise_entry("Merchandise Receipt", item_code, 4, target_warehouse=warehouse)
+
+		ledger_entry = frappe.get_doc({
+			"doctype": "Merchandise Ledger",
+			"merchandise_item_code": item_code,
+			"merchandise_warehouse": warehouse,
+			"posting_date": today(),
+			"posting_time": nowtime(),
+			"quantity": 3,
+			"transaction_type": "Merchandise Receipt"
+		}).insert(ignore_permissions=True)
+
+		self.assertEqual(ledger_entry.balance_after, 7)
+		self.assertEqual(frappe.db.get_value("Merchandise Ledger", ledger_entry.name, "balance_after"), 7)
+		self.assertEqual(get_bin_qty(item_code, warehouse), 7)
+		self.assertEqual(frappe.db.get_value("Warehouse Merchandise Detail", {
+			"parent": warehouse,
+			"merchandise_item_code": item_code
+		}, "balance_quantity"), 7)
@@ -0,0 +1,90 @@
+# Copyright (c) 2024, Victor Mandela and Contributors
+# See license.txt
+
+import frappe
+from frappe.tests.utils import FrappeTestCase
+from frappe.utils import add_days, today
+from colorapp.merchandise.doctype.merchandise_bin.merchandise_bin import get_bin_qty
+from colorapp.merchandise.repost import repost_ledger
+from colorapp.tests.utils import (
+	commit_ledger_row, delete_committed_stock, get_ledger_balances_after, get_second_connection,
+	make_merchandise_entry, make_merchandise_item, make_merchandise_warehouse
+)
+
+
+class TestMerchandiseLedgerRepost(FrappeTestCase):
+	def setUp(self):
+		self.item_code = make_merchandise_item()
+		self.warehouse = make_merchandise_warehouse()
+		self.posting_date = add_days(today(), -1)
+
+	def get_queued_repost(self):
+		return frappe.db.get_value("Merchandise Ledger Repost", {
+			"merchandise_item_code": self.item_code,
+			"merchandise_warehouse": self.warehouse,
+			"status": "Queued"
+		})
+
+	def test_backdated_posting_queues_one_repost(self):
+		make_merchandise_entry("Merchandise Receipt", self.item_code, 10, target_warehouse=self.warehouse,
+			posting_date=self.posting_date, posting_time="12:00:00")
+		self.assertIsNone(self.get_queued_repost())
+
+		make_merchandise_entry("Merchandise Receipt", self.item_code, 1, target_warehouse=self.warehouse,
+			posting_date=self.posting_date, posting_time="10:00:00")
+		make_merchandise_entry("Merchandise Receipt", self.item_code, 1, target_warehouse=self.warehouse,
+			posting_date=self.posting_date, posting_time="09:00:00")
+
+		reposts = frappe.get_all("Merchandise Ledger Repost", filters={
+			"merchandise_item_code": self.item_code,
+			"merchandise_warehouse": self.warehouse,
+			"status": "Queued"
+		}, fields=["posting_datetime"])
+		self.assertEqual(len(reposts), 1)
+		self.assertEqual(str(reposts[0].posting_datetime), f"{self.posting_date} 09:00:00")
+
+	def test_repost_recomputes_the_tail(self):
+		make_merchandise_entry("Merchandise Receipt", self.item_code, 10, target_warehouse=self.warehouse,
+			posting_date=self.posting_date, posting_time="10:00:00")
+		make_merchandise_entry("Merchandise Issue", self.item_code, 3, source_warehouse=self.warehouse,
+			posting_date=self.posting_date, posting_time="12:00:00")
+
+		# Posted before both rows, balance_after starts from the current bin until the repost runs
+		make_merchandise_entry("Merchandise Receipt", self.item_code, 5, target_warehouse=self.warehouse,
+			posting_date=self.posting_date, posting_time="09:00:00")
+		self.assertEqual(get_ledger_balances_after(self.item_code, self.warehouse), [12, 10, 7])
+
+		repost_name = self.get_queued_repost()
+		repost_ledger(repost_name)
+
+		self.assertEqual(get_ledger_balances_after(self.item_code, self.warehouse), [5, 15, 12])
+		self.assertEqual(get_bin_qty(self.item_code, self.warehouse), 12)
+
+		repost = frappe.get_doc("Merchandise Ledger Repost", repost_name)
+		self.assertEqual(repost.status, "Completed")
+		self.assertEqual(repost.rows_reposted, 3)
+		self.assertEqual(repost.rows_updated, 3)
+
+	def test_repost_includes_posting_committed_while_waiting(self):
+		make_merchandise_entry("Merchandise Receipt", self.item_code, 10, target_warehouse=self.warehouse,
+			posting_date=self.posting_date, posting_time="10:00:00")
+		make_merchandise_entry("Merchandise Receipt", self.item_code, 5, target_warehouse=self.warehouse,
+			posting_date=self.posting_date, posting_time="09:00:00")
+		repost_name = self.get_queued_repost()
+		frappe.db.commit()
+
+		try:
+			# The repost job reads the repost first, which opens its snapshot
+			frappe.get_doc("Merchandise Ledger Repost", repost_name)
+
+			# A posting that held the bin lock commits before the repost takes it
+			second_connection = get_second_connection()
+			commit_ledger_row(second_connection, self.item_code, self.warehouse, 2, f"{self.posting_date} 13:00:00")
+			second_connection.close()
+
+			repost_ledger(repost_name)
+
+			self.assertEqual(get_ledger_balances_after(self.item_code, self.warehouse), [5, 15, 17])
+			self.assertEqual(get_bin_qty(self.item_code, self.warehouse), 17)
+		finally:
+			delete_committed_stock(self.item_code, self.warehouse)
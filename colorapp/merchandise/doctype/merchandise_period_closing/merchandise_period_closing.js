@@ -0,0 +1,17 @@
+// Copyright (c) 2024, Victor Mandela and contributors
+// For license information, please see license.txt
+
+frappe.ui.form.on("Merchandise Period Closing", {
+    refresh(frm) {
+        // Archiving moves the ledger rows before the closing to the Merchandise Ledger Archive
+        if (frm.doc.docstatus === 1 && !frm.doc.ledger_archived) {
+            frm.add_custom_button(__('Archive Ledger'), function() {
+                frappe.confirm(__('Move the ledger rows posted up to {0} to the archive?', [frm.doc.closing_date]), function() {
+                    frm.call('archive_ledger').then(() => {
+                        frappe.show_alert({message: __('Ledger archiving has been queued'), indicator: 'blue'});
+                    });
+                });
+            });
+        }
+    },
+});
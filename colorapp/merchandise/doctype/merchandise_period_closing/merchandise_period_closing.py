@@ -0,0 +1,52 @@
+# Copyright (c) 2024, Victor Mandela and contributors
+# For license information, please see license.txt
+
+import frappe
+from frappe import _
+from frappe.model.document import Document
+from frappe.utils import getdate, today
+from colorapp.merchandise.period_closing import archive_ledger_rows, get_latest_closing, make_closing_balances
+
+
+class MerchandisePeriodClosing(Document):
+
+    def validate(self):
+        if getdate(self.closing_date) >= getdate(today()):
+            frappe.throw(_("Closing Date must be before today"))
+
+        latest_closing = get_latest_closing()
+        if latest_closing and getdate(self.closing_date) <= getdate(latest_closing.closing_date):
+            frappe.throw(_("Closing Date must be after the latest closing {0} on {1}").format(
+                latest_closing.name, latest_closing.closing_date))
+
+    def on_submit(self):
+        # Snapshot the balances at the closing date, queries then start from this closing
+        self.db_set("closing_balance_count", make_closing_balances(self))
+
+    def on_cancel(self):
+        if self.ledger_archived:
+            frappe.throw(_("The ledger rows of this closing are archived, it cannot be cancelled"))
+
+        latest_closing = get_latest_closing()
+        if latest_closing and getdate(latest_closing.closing_date) > getdate(self.closing_date):
+            frappe.throw(_("Only the latest period closing can be cancelled, cancel {0} first").format(latest_closing.name))
+
+        frappe.db.delete("Merchandise Closing Balance", {"period_closing": self.name})
+        self.db_set("closing_balance_count", 0)
+
+    @frappe.whitelist()
+    def archive_ledger(self):
+        """
+        Moves the ledger rows of this closing to the Merchandise Ledger Archive in a background job.
+        """
+        frappe.only_for("System Manager")
+        if self.docstatus != 1:
+            frappe.throw(_("Submit the period closing before archiving the ledger"))
+
+        frappe.enqueue(
+            archive_ledger_rows,
+            queue="long",
+            timeout=3600,
+            closing_name=self.name,
+            enqueue_after_commit=True
+        )
@@ -0,0 +1,64 @@
+# Copyright (c) 2024, Victor Mandela and Contributors
+# See license.txt
+
+import frappe
+from frappe.tests.utils import FrappeTestCase
+from colorapp.merchandise.period_closing import get_ledger_balances
+from colorapp.tests.utils import make_merchandise_entry, make_merchandise_item, make_merchandise_warehouse
+
+
+class TestMerchandisePeriodClosing(FrappeTestCase):
+	def setUp(self):
+		# Closings are global, each test rolls its closing back so the next one can close the same period
+		frappe.db.savepoint("period_closing_test")
+
+		self.item_code = make_merchandise_item()
+		self.warehouse = make_merchandise_warehouse()
+		self.key = (self.item_code, self.warehouse)
+
+		self.receipt = make_merchandise_entry("Merchandise Receipt", self.item_code, 10, target_warehouse=self.warehouse,
+			posting_date="2000-01-10", posting_time="10:00:00")
+		make_merchandise_entry("Merchandise Issue", self.item_code, 4, source_warehouse=self.warehouse,
+			posting_date="2000-01-20", posting_time="10:00:00")
+
+		self.closing = frappe.get_doc({
+			"doctype": "Merchandise Period Closing",
+			"closing_date": "2000-01-31"
+		})
+		self.closing.submit()
+
+	def tearDown(self):
+		frappe.db.rollback(save_point="period_closing_test")
+
+	def test_closing_snapshots_balances(self):
+		self.assertEqual(frappe.db.get_value("Merchandise Closing Balance", {
+			"period_closing": self.closing.name,
+			"merchandise_item_code": self.item_code,
+			"merchandise_warehouse": self.warehouse
+		}, "balance_quantity"), 6)
+
+	def test_balances_start_from_the_closing(self):
+		make_merchandise_entry("Merchandise Receipt", self.item_code, 5, target_warehouse=self.warehouse,
+			posting_date="2000-02-05", posting_time="10:00:00")
+
+		self.assertEqual(get_ledger_balances(item_warehouse_pairs=[self.key])[self.key], 11)
+		self.assertEqual(get_ledger_balances(to_datetime="2000-02-01", item_warehouse_pairs=[self.key])[self.key], 6)
+		self.assertEqual(get_ledger_balances(to_datetime="2000-02-05 10:00:01", item_warehouse_pairs=[self.key])[self.key], 11)
+
+	def test_closed_period_rejects_postings(self):
+		self.assertRaises(frappe.ValidationError, make_merchandise_entry,
+			"Merchandise Receipt", self.item_code, 1, target_warehouse=self.warehouse,
+			posting_date="2000-01-31", posting_time="10:00:00")
+		self.assertRaises(frappe.ValidationError, self.receipt.cancel)
+
+	def test_only_the_latest_closing_can_be_cancelled(self):
+		later_closing = frappe.get_doc({
+			"doctype": "Merchandise Period Closing",
+			"closing_date": "2000-02-29"
+		})
+		later_closing.submit()
+
+		self.assertRaises(frappe.ValidationError, self.closing.cancel)
+		later_closing.cancel()
+		self.closing.cancel()
+		self.assertFalse(frappe.db.exists("Merchandise Closing Balance", {"period_closing": self.closing.name}))
@@ -1,9 +1,27 @@
 # Copyright (c) 2024, Victor Mandela and contributors
 # For license information, please see license.txt
 
-# import frappe
 from frappe.model.document import Document
+from colorapp.merchandise.masters import clear_warehouse_master
+from colorapp.merchandise.stock_ledger import get_bin_balances
 
 
 class MerchandiseWarehouse(Document):
-	pass
+	def validate(self):
+		self.set_item_balances()
+
+	def on_update(self):
+		clear_warehouse_master(self.name)
+
+	def on_trash(self):
+		clear_warehouse_master(self.name)
+
+	def set_item_balances(self):
+		# Postings update the item rows without saving the warehouse, so a form opened before a posting holds
+		# stale balances. Read them again from the Merchandise Bins so a save never overwrites newer balances.
+		balances = get_bin_balances([
+			(item.merchandise_item_code, self.name) for item in self.merchandise_warehouse_item if item.merchandise_item_code
+		])
+		for item in self.merchandise_warehouse_item:
+			if item.merchandise_item_code:
+				item.balance_quantity = balances[(item.merchandise_item_code, self.name)]
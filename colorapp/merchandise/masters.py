@@ -0,0 +1,91 @@
+# Copyright (c) 2024, Victor Mandela and contributors
+# For license information, please see license.txt
+
+import frappe
+
+# Redis hashes holding the master data read while posting, keyed by document name
+ITEM_CACHE_KEY = "merchandise_item_master"
+WAREHOUSE_CACHE_KEY = "merchandise_warehouse_master"
+
+ITEM_FIELDS = ["name", "merchandise_item_name", "minimum_stock_level", "maintain_stock", "disabled"]
+WAREHOUSE_FIELDS = ["name", "merchandise_warehouse_name", "merchandise_warehouse_type", "disabled"]
+
+
+def get_item_masters(item_codes):
+    """
+    Returns {item_code: item} with the ITEM_FIELDS of each Merchandise Item.
+    Items are read from the cache, items not cached yet are fetched in one query and cached.
+    Items that do not exist are left out.
+    """
+    return get_cached_masters(ITEM_CACHE_KEY, item_codes, fetch_items)
+
+
+def get_warehouse_masters(warehouses):
+    """
+    Returns {warehouse: warehouse} with the WAREHOUSE_FIELDS of each Merchandise Warehouse and the email of
+    the user assigned to it as warehouse_user. Uncached warehouses are fetched with one query per doctype.
+    """
+    return get_cached_masters(WAREHOUSE_CACHE_KEY, warehouses, fetch_warehouses)
+
+
+def get_cached_masters(cache_key, names, fetch):
+    names = {name for name in names if name}
+    cache = frappe.cache()
+
+    masters = {}
+    for name in names:
+        master = cache.hget(cache_key, name)
+        if master is not None:
+            masters[name] = master
+
+    missing = names - set(masters)
+    if missing:
+        for name, master in fetch(list(missing)).items():
+            cache.hset(cache_key, name, master)
+            masters[name] = master
+
+    return masters
+
+
+def fetch_items(item_codes):
+    return {
+        item.name: item for item in frappe.get_all(
+            "Merchandise Item", filters={"name": ["in", item_codes]}, fields=ITEM_FIELDS
+        )
+    }
+
+
+def fetch_warehouses(warehouses):
+    warehouse_users = dict(frappe.get_all(
+        "User",
+        filters={"merchandise_warehouse": ["in", warehouses]},
+        fields=["merchandise_warehouse", "email"],
+        as_list=True
+    ))
+
+    masters = {}
+    for warehouse in frappe.get_all("Merchandise Warehouse", filters={"name": ["in", warehouses]}, fields=WAREHOUSE_FIELDS):
+        warehouse.warehouse_user = warehouse_users.get(warehouse.name)
+        masters[warehouse.name] = warehouse
+    return masters
+
+
+def clear_item_master(item_code):
+    frappe.cache().hdel(ITEM_CACHE_KEY, item_code)
+
+
+def clear_warehouse_master(warehouse):
+    frappe.cache().hdel(WAREHOUSE_CACHE_KEY, warehouse)
+
+
+def clear_user_warehouse(doc, method=None):
+    """
+    Clears the cached warehouses of a User whose merchandise warehouse changed, called on User update and delete.
+    """
+    if method != "on_trash" and not doc.has_value_changed("merchandise_warehouse"):
+        return
+
+    doc_before_save = doc.get_doc_before_save()
+    for warehouse in {doc.get("merchandise_warehouse"), doc_before_save and doc_before_save.get("merchandise_warehouse")}:
+        if warehouse:
+            clear_warehouse_master(warehouse)
@@ -0,0 +1,212 @@
+# Copyright (c) 2024, Victor Mandela and contributors
+# For license information, please see license.txt
+
+import frappe
+from frappe import _
+from collections import defaultdict
+from frappe.utils import add_days, add_months, flt, get_datetime, get_last_day, getdate, now, today
+
+# Ledger rows moved to the archive per transaction
+ARCHIVE_CHUNK_SIZE = 5000
+
+# Columns copied from the Merchandise Ledger to the Merchandise Ledger Archive
+ARCHIVE_COLUMNS = [
+    "name", "creation", "modified", "modified_by", "owner", "docstatus", "idx",
+    "merchandise_item_code", "merchandise_item_name", "merchandise_warehouse",
+    "posting_date", "posting_time", "posting_datetime", "quantity", "balance_after",
+    "balance_quantity", "transaction_type", "is_cancelled", "reference_doc_name", "transaction_remarks"
+]
+
+
+def get_closing_cutoff(closing_date):
+    """
+    Returns the datetime a closing ends at. Ledger rows posted before it are part of the closing.
+    """
+    return get_datetime(add_days(getdate(closing_date), 1))
+
+
+def get_latest_closing(before_date=None):
+    """
+    Returns the submitted Merchandise Period Closing with the latest closing date, before before_date if given.
+    """
+    filters = {"docstatus": 1}
+    if before_date:
+        filters["closing_date"] = ["<", getdate(before_date)]
+
+    closings = frappe.get_all(
+        "Merchandise Period Closing",
+        filters=filters,
+        fields=["name", "closing_date", "ledger_archived"],
+        order_by="closing_date desc",
+        limit=1
+    )
+    return closings[0] if closings else None
+
+
+def get_ledger_balances(to_datetime=None, item_warehouse_pairs=None, lock=False):
+    """
+    Returns {(item_code, warehouse): balance} of the ledger rows posted before to_datetime, or of all rows.
+    Balances start from the latest closing snapshot before to_datetime, so only the ledger rows posted after
+    it are summed. item_warehouse_pairs limits the result to those pairs. With lock the ledger rows are read
+    with a locking read, which sees rows committed after the transaction's snapshot was taken.
+    """
+    closing = get_latest_closing(before_date=to_datetime and getdate(to_datetime))
+    latest_archived = frappe.get_all(
+        "Merchandise Period Closing",
+        filters={"docstatus": 1, "ledger_archived": 1},
+        fields=["closing_date"],
+        order_by="closing_date desc",
+        limit=1
+    )
+    if to_datetime and latest_archived and get_datetime(to_datetime) < get_closing_cutoff(latest_archived[0].closing_date):
+        frappe.throw(_("Ledger rows before {0} are archived, balances before that date are not available.").format(
+            get_closing_cutoff(latest_archived[0].closing_date)))
+
+    return sum_ledger_balances(closing, to_datetime, item_warehouse_pairs, lock)
+
+
+def sum_ledger_balances(closing, to_datetime=None, item_warehouse_pairs=None, lock=False):
+    """
+    Returns the balances of the closing plus the ledger rows posted after its cutoff and before to_datetime.
+    Without a closing all the rows in the Merchandise Ledger are summed.
+    """
+    pairs = set(item_warehouse_pairs or [])
+    balances = defaultdict(float)
+    conditions = ["IFNULL(merchandise_item_code, '') != ''", "IFNULL(merchandise_warehouse, '') != ''"]
+    values = {}
+
+    if closing:
+        closing_filters = {"period_closing": closing.name}
+        if pairs:
+            closing_filters["merchandise_item_code"] = ["in", list({item_code for item_code, warehouse in pairs})]
+            closing_filters["merchandise_warehouse"] = ["in", list({warehouse for item_code, warehouse in pairs})]
+        for row in frappe.get_all(
+            "Merchandise Closing Balance",
+            filters=closing_filters,
+            fields=["merchandise_item_code", "merchandise_warehouse", "balance_quantity"]
+        ):
+            balances[(row.merchandise_item_code, row.merchandise_warehouse)] += flt(row.balance_quantity)
+
+        conditions.append("posting_datetime >= %(from_datetime)s")
+        values["from_datetime"] = get_closing_cutoff(closing.closing_date)
+
+    if to_datetime:
+        conditions.append("posting_datetime < %(to_datetime)s")
+        values["to_datetime"] = get_datetime(to_datetime)
+
+    if pairs:
+        conditions.append("merchandise_item_code IN %(item_codes)s AND merchandise_warehouse IN %(warehouses)s")
+        values["item_codes"] = tuple({item_code for item_code, warehouse in pairs})
+        values["warehouses"] = tuple({warehouse for item_code, warehouse in pairs})
+
+    for item_code, warehouse, quantity in frappe.db.sql(f"""
+        SELECT merchandise_item_code, merchandise_warehouse, SUM(quantity)
+        FROM `tabMerchandise Ledger`
+        WHERE {" AND ".join(conditions)}
+        GROUP BY merchandise_item_code, merchandise_warehouse
+        {"LOCK IN SHARE MODE" if lock else ""}
+    """, values):
+        balances[(item_code, warehouse)] += flt(quantity)
+
+    if pairs:
+        return {pair: balances.get(pair, 0.0) for pair in pairs}
+    return dict(balances)
+
+
+def make_closing_balances(closing):
+    """
+    Snapshots the balance of every item and warehouse at the cutoff of the closing, starting from the
+    previous closing. Pairs with a zero balance are left out. Returns the number of balances saved.
+    """
+    previous_closing = get_latest_closing(before_date=closing.closing_date)
+    balances = sum_ledger_balances(previous_closing, to_datetime=get_closing_cutoff(closing.closing_date))
+
+    timestamp = now()
+    user = frappe.session.user
+    values = [
+        [frappe.generate_hash(length=10), timestamp, timestamp, user, user, 0, 0,
+         closing.name, closing.closing_date, item_code, warehouse, balance]
+        for (item_code, warehouse), balance in balances.items() if balance
+    ]
+    frappe.db.bulk_insert(
+        "Merchandise Closing Balance",
+        ["name", "creation", "modified", "owner", "modified_by", "docstatus", "idx",
+         "period_closing", "closing_date", "merchandise_item_code", "merchandise_warehouse", "balance_quantity"],
+        values
+    )
+    return len(values)
+
+
+def archive_ledger_rows(closing_name):
+    """
+    Moves the Merchandise Ledger rows posted before the cutoff of a submitted closing to the Merchandise
+    Ledger Archive, one chunk per transaction, so an interrupted run can be resumed.
+    """
+    closing = frappe.get_doc("Merchandise Period Closing", closing_name)
+    if closing.docstatus != 1:
+        frappe.throw(_("Only submitted period closings can archive the ledger."))
+
+    cutoff = get_closing_cutoff(closing.closing_date)
+    columns = ", ".join(f"`{column}`" for column in ARCHIVE_COLUMNS)
+    archived_rows = closing.archived_rows or 0
+
+    while True:
+        names = frappe.db.sql_list("""
+            SELECT name FROM `tabMerchandise Ledger`
+            WHERE posting_datetime < %s
+            ORDER BY posting_datetime
+            LIMIT %s
+        """, (cutoff, ARCHIVE_CHUNK_SIZE))
+        if not names:
+            break
+
+        frappe.db.sql(f"""
+            INSERT INTO `tabMerchandise Ledger Archive` ({columns})
+            SELECT {columns} FROM `tabMerchandise Ledger` WHERE name IN %(names)s
+        """, {"names": tuple(names)})
+        frappe.db.sql("DELETE FROM `tabMerchandise Ledger` WHERE name IN %(names)s", {"names": tuple(names)})
+
+        archived_rows += len(names)
+        closing.db_set("archived_rows", archived_rows, update_modified=False)
+        frappe.db.commit()
+
+    closing.db_set("ledger_archived", 1)
+    frappe.db.commit()
+
+
+def make_monthly_closing():
+    """
+    Closes the previous month if Enable Monthly Closing is set in Merchandise Settings, and archives the ledger
+    rows of the latest closing older than Archive After Months if Archive Closed Ledger is set. Runs monthly from
+    the scheduler, closings and archiving can otherwise be done from the Merchandise Period Closing form.
+    """
+    settings = frappe.get_cached_doc("Merchandise Settings")
+
+    if settings.enable_monthly_closing:
+        closing_date = get_last_day(add_months(today(), -1))
+        latest_closing = get_latest_closing()
+
+        if not latest_closing or getdate(latest_closing.closing_date) < closing_date:
+            frappe.get_doc({
+                "doctype": "Merchandise Period Closing",
+                "closing_date": closing_date,
+                "closing_remarks": "Monthly closing"
+            }).submit()
+            frappe.db.commit()
+
+    if not settings.archive_closed_ledger:
+        return
+
+    archivable = frappe.get_all(
+        "Merchandise Period Closing",
+        filters={
+            "docstatus": 1,
+            "ledger_archived": 0,
+            "closing_date": ["<=", get_last_day(add_months(today(), -(settings.archive_after_months or 0)))]
+        },
+        order_by="closing_date desc",
+        limit=1,
+        pluck="name"
+    )
+    if archivable:
+        archive_ledger_rows(archivable[0])
@@ -0,0 +1,6 @@
+// Copyright (c) 2024, Victor Mandela and contributors
+// For license information, please see license.txt
+
+frappe.query_reports["Database Index Status"] = {
+	filters: [],
+};
@@ -0,0 +1,15 @@
+# Copyright (c) 2024, Victor Mandela and contributors
+# For license information, please see license.txt
+
+from frappe import _
+from colorapp.indexes import get_index_status
+
+
+def execute(filters=None):
+    columns = [
+        {"fieldname": "doctype_name", "label": _("DocType"), "fieldtype": "Link", "options": "DocType", "width": 220},
+        {"fieldname": "index_name", "label": _("Index Name"), "fieldtype": "Data", "width": 240},
+        {"fieldname": "columns", "label": _("Columns"), "fieldtype": "Data", "width": 360},
+        {"fieldname": "exists", "label": _("Exists"), "fieldtype": "Check", "width": 90},
+    ]
+    return columns, get_index_status()
@@ -0,0 +1,142 @@
+# Copyright (c) 2024, Victor Mandela and contributors
+# For license information, please see license.txt
+
+import frappe
+from frappe import _
+from frappe.utils import flt, now, now_datetime
+from colorapp.merchandise.period_closing import get_ledger_balances
+from colorapp.merchandise.stock_ledger import clear_warehouse_balance_cache, get_locked_bins, update_warehouse_balances
+
+# Ledger rows read and updated per query while reposting
+REPOST_CHUNK_SIZE = 5000
+
+
+def process_repost_queue():
+    """
+    Reposts every queued Merchandise Ledger Repost, oldest first, one transaction per repost.
+    Reposts queued while the job runs are picked up before it finishes. Also runs hourly from the scheduler.
+    """
+    while True:
+        reposts = frappe.get_all(
+            "Merchandise Ledger Repost",
+            filters={"status": "Queued"},
+            order_by="creation",
+            limit=100,
+            pluck="name"
+        )
+        if not reposts:
+            break
+
+        for repost_name in reposts:
+            try:
+                repost_ledger(repost_name)
+                frappe.db.commit()
+            except Exception:
+                frappe.db.rollback()
+                frappe.db.set_value("Merchandise Ledger Repost", repost_name, {
+                    "status": "Failed",
+                    "error_log": frappe.get_traceback()
+                })
+                frappe.db.commit()
+                frappe.get_doc("Merchandise Ledger Repost", repost_name).log_error(_("Merchandise ledger repost failed"))
+
+
+def repost_ledger(repost_name):
+    """
+    Recomputes balance_after of the ledger rows of one item and warehouse posted from the repost point onwards.
+    The running balance starts from the balance just before the repost point, read from the latest period
+    closing, and only rows whose balance changed are written. The bin and warehouse balances are then moved
+    to the final running balance. The bin stays locked for the whole repost, so postings wait for it.
+    The repost and the bin are locked before anything else is read, and the ledger is read with locking reads,
+    so postings committed while the repost waited for the bin lock are included.
+    """
+    repost = frappe.db.sql("""
+        SELECT merchandise_item_code, merchandise_item_name, merchandise_warehouse, posting_datetime, status
+        FROM `tabMerchandise Ledger Repost`
+        WHERE name = %s
+        FOR UPDATE
+    """, repost_name, as_dict=True)[0]
+    if repost.status != "Queued":
+        return
+
+    key = (repost.merchandise_item_code, repost.merchandise_warehouse)
+    locked_bins = get_locked_bins([key])
+
+    # Postings waiting on the bin lock may have moved the repost point earlier, read it again under the lock
+    repost_from = frappe.db.get_value("Merchandise Ledger Repost", repost_name, "posting_datetime", for_update=True)
+    balance = get_ledger_balances(to_datetime=repost_from, item_warehouse_pairs=[key], lock=True)[key]
+
+    rows_reposted = rows_updated = 0
+    last_row = None
+
+    while True:
+        conditions = "posting_datetime >= %(repost_from)s"
+        if last_row:
+            conditions = """(posting_datetime > %(last_datetime)s
+                OR (posting_datetime = %(last_datetime)s AND (creation > %(last_creation)s
+                    OR (creation = %(last_creation)s AND name > %(last_name)s))))"""
+
+        rows = frappe.db.sql(f"""
+            SELECT name, posting_datetime, creation, quantity, balance_after
+            FROM `tabMerchandise Ledger`
+            WHERE merchandise_item_code = %(item_code)s AND merchandise_warehouse = %(warehouse)s AND {conditions}
+            ORDER BY posting_datetime, creation, name
+            LIMIT %(chunk_size)s
+            LOCK IN SHARE MODE
+        """, {
+            "item_code": key[0],
+            "warehouse": key[1],
+            "repost_from": repost_from,
+            "last_datetime": last_row and last_row.posting_datetime,
+            "last_creation": last_row and last_row.creation,
+            "last_name": last_row and last_row.name,
+            "chunk_size": REPOST_CHUNK_SIZE
+        }, as_dict=True)
+
+        changed_balances = {}
+        for row in rows:
+            balance += flt(row.quantity)
+            if flt(row.balance_after) != balance:
+                changed_balances[row.name] = balance
+
+        update_balance_after(changed_balances)
+        rows_reposted += len(rows)
+        rows_updated += len(changed_balances)
+
+        if len(rows) < REPOST_CHUNK_SIZE:
+            break
+        last_row = rows[-1]
+
+    # Move the bin by the difference to the balance read under the lock
+    frappe.db.sql("""
+        UPDATE `tabMerchandise Bin`
+        SET balance_quantity = balance_quantity + %s, modified = %s
+        WHERE name = %s
+    """, (balance - flt(locked_bins[key].balance_quantity), now(), locked_bins[key].name))
+    update_warehouse_balances({key: balance}, {key[0]: repost.merchandise_item_name})
+    clear_warehouse_balance_cache([key[1]])
+
+    frappe.db.set_value("Merchandise Ledger Repost", repost_name, {
+        "status": "Completed",
+        "rows_reposted": rows_reposted,
+        "rows_updated": rows_updated,
+        "reposted_on": now_datetime()
+    })
+
+
+def update_balance_after(changed_balances):
+    """
+    Sets balance_after of the ledger rows in {name: balance} with one statement.
+    """
+    if not changed_balances:
+        return
+
+    frappe.db.sql("""
+        UPDATE `tabMerchandise Ledger`
+        SET balance_after = CASE name {cases} END
+        WHERE name IN %(names)s
+    """.format(cases=" ".join(f"WHEN %(name_{i})s THEN %(balance_{i})s" for i in range(len(changed_balances)))), dict(
+        {f"name_{i}": name for i, name in enumerate(changed_balances)},
+        **{f"balance_{i}": balance for i, balance in enumerate(changed_balances.values())},
+        names=tuple(changed_balances)
+    ))
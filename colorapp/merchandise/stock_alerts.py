@@ -0,0 +1,150 @@
+# Copyright (c) 2024, Victor Mandela and contributors
+# For license information, please see license.txt
+
+import frappe
+from collections import defaultdict
+from datetime import timedelta
+from frappe.utils import flt, get_datetime, now_datetime
+from colorapp.merchandise.masters import get_item_masters, get_warehouse_masters
+
+# A notified alert that stays below minimum is included in the digest again after this many hours
+ALERT_WINDOW_HOURS = 24
+
+
+def update_stock_alerts(balances):
+    """
+    Keeps one unresolved Merchandise Stock Alert per (item, warehouse) below its minimum stock level.
+    balances are the {(item_code, warehouse): balance} after a posting. A pair that is still low updates its
+    alert instead of creating a new one, a pair back at or above the minimum resolves its alert.
+    Alerts are delivered by send_low_stock_digest. Callers hold the bin locks of the pairs, so concurrent
+    postings cannot create two alerts for the same pair.
+    """
+    if not balances:
+        return
+
+    merchandise_items = get_item_masters({item_code for item_code, warehouse in balances})
+    open_alerts = {
+        (alert.merchandise_item_code, alert.merchandise_warehouse): alert for alert in frappe.get_all(
+            "Merchandise Stock Alert",
+            filters={
+                "status": ["in", ["Open", "Notified"]],
+                "merchandise_item_code": ["in", list({item_code for item_code, warehouse in balances})],
+                "merchandise_warehouse": ["in", list({warehouse for item_code, warehouse in balances})]
+            },
+            fields=["name", "merchandise_item_code", "merchandise_warehouse", "status", "notified_on", "alert_count"]
+        )
+    }
+
+    timestamp = now_datetime()
+    resolved_alerts = []
+    new_alerts = []
+
+    for key, balance_quantity in balances.items():
+        merchandise_item = merchandise_items.get(key[0])
+        if not merchandise_item:
+            continue
+
+        alert = open_alerts.get(key)
+        minimum_stock_level = flt(merchandise_item.minimum_stock_level)
+
+        if balance_quantity >= minimum_stock_level:
+            if alert:
+                resolved_alerts.append(alert.name)
+            continue
+
+        if not alert:
+            new_alerts.append((merchandise_item, key[1], balance_quantity))
+            continue
+
+        values = {
+            "balance_quantity": balance_quantity,
+            "minimum_stock_level": minimum_stock_level,
+            "last_alerted_on": timestamp,
+            "alert_count": alert.alert_count + 1
+        }
+        if alert.status == "Notified" and get_datetime(alert.notified_on) < timestamp - timedelta(hours=ALERT_WINDOW_HOURS):
+            values["status"] = "Open"
+        frappe.db.set_value("Merchandise Stock Alert", alert.name, values)
+
+    if resolved_alerts:
+        frappe.db.set_value("Merchandise Stock Alert", {"name": ["in", resolved_alerts]}, {
+            "status": "Resolved",
+            "resolved_on": timestamp
+        })
+
+    if new_alerts:
+        warehouses = get_warehouse_masters({warehouse for merchandise_item, warehouse, balance_quantity in new_alerts})
+        for merchandise_item, warehouse, balance_quantity in new_alerts:
+            frappe.get_doc({
+                "doctype": "Merchandise Stock Alert",
+                "merchandise_item_code": merchandise_item.name,
+                "merchandise_item_name": merchandise_item.merchandise_item_name,
+                "merchandise_warehouse": warehouse,
+                "warehouse_user": warehouses[warehouse].warehouse_user if warehouse in warehouses else None,
+                "status": "Open",
+                "balance_quantity": balance_quantity,
+                "minimum_stock_level": flt(merchandise_item.minimum_stock_level),
+                "alert_count": 1,
+                "first_alerted_on": timestamp,
+                "last_alerted_on": timestamp
+            }).insert(ignore_permissions=True)
+
+
+def send_low_stock_digest():
+    """
+    Sends each warehouse user one system notification listing their open low-stock alerts, then marks
+    the alerts as notified. Runs hourly from the scheduler.
+    """
+    alerts = frappe.get_all(
+        "Merchandise Stock Alert",
+        filters={"status": "Open"},
+        fields=["name", "merchandise_item_code", "merchandise_item_name", "merchandise_warehouse",
+                "warehouse_user", "balance_quantity", "minimum_stock_level"],
+        order_by="merchandise_warehouse, merchandise_item_name"
+    )
+    if not alerts:
+        return
+
+    alerts_by_user = defaultdict(list)
+    for alert in alerts:
+        alerts_by_user[alert.warehouse_user].append(alert)
+
+    for user, user_alerts in alerts_by_user.items():
+        # Warehouses without a user are marked notified so they do not pile up in every digest
+        if user:
+            create_digest_notification(user, user_alerts)
+
+    frappe.db.set_value("Merchandise Stock Alert", {"name": ["in", [alert.name for alert in alerts]]}, {
+        "status": "Notified",
+        "notified_on": now_datetime()
+    })
+
+
+def create_digest_notification(user, alerts):
+    """
+    Creates the low-stock digest notification of a user.
+    """
+    lines = "".join(
+        f"<li>{alert.merchandise_item_name or alert.merchandise_item_code} in warehouse {alert.merchandise_warehouse}: "
+        f"balance {alert.balance_quantity}, minimum {alert.minimum_stock_level}</li>"
+        for alert in alerts
+    )
+    message = (f"The following items are below their minimum stock level:<ul>{lines}</ul>"
+               f"Please reorder or create a merchandise request.")
+
+    frappe.get_doc({
+        "doctype": "Notification Log",
+        "subject": f"Low Stock Digest: {len(alerts)} item(s) below minimum level",
+        "email_content": message,
+        "for_user": user,
+        "type": "Alert",
+        "document_type": "Merchandise Stock Alert",
+        "document_name": alerts[0].name
+    }).insert(ignore_permissions=True)
+
+    # Optional: send an email (uncomment this when email setup is ready)
+    # frappe.sendmail(
+    #     recipients=[user],
+    #     subject=f"Low Stock Digest: {len(alerts)} item(s) below minimum level",
+    #     message=message
+    # )
@@ -0,0 +1,422 @@
+# Copyright (c) 2024, Victor Mandela and contributors
+# For license information, please see license.txt
+
+import frappe
+from frappe import _
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+from frappe.utils import flt, get_datetime, now
+from colorapp.merchandise.doctype.merchandise_bin.merchandise_bin import make_bins
+from colorapp.merchandise.period_closing import get_ledger_balances
+
+# Seconds the bin balances of a warehouse stay cached for the Merchandise Entry form
+BALANCE_CACHE_TTL = 30
+
+# Merchandise Ledger fields written by the batched posting path
+LEDGER_FIELDS = [
+    "merchandise_item_code",
+    "merchandise_item_name",
+    "merchandise_warehouse",
+    "posting_date",
+    "posting_time",
+    "posting_datetime",
+    "quantity",
+    "balance_after",
+    "transaction_type",
+    "reference_doc_name",
+    "transaction_remarks",
+    "is_cancelled"
+]
+
+
+def get_bin_balances(item_warehouse_pairs):
+    """
+    Returns the current balance for every (item_code, warehouse) pair, fetched from the Merchandise Bin in one query.
+    Pairs without a bin have a balance of 0.
+    """
+    balances = {pair: 0.0 for pair in item_warehouse_pairs}
+    if not balances:
+        return balances
+
+    bins = frappe.get_all(
+        "Merchandise Bin",
+        filters={
+            "merchandise_item_code": ["in", list({item_code for item_code, warehouse in balances})],
+            "merchandise_warehouse": ["in", list({warehouse for item_code, warehouse in balances})]
+        },
+        fields=["merchandise_item_code", "merchandise_warehouse", "balance_quantity"]
+    )
+    for item_bin in bins:
+        key = (item_bin.merchandise_item_code, item_bin.merchandise_warehouse)
+        if key in balances:
+            balances[key] = flt(item_bin.balance_quantity)
+
+    return balances
+
+
+def get_warehouse_balances(warehouses):
+    """
+    Returns {warehouse: {item_code: balance}} with the Merchandise Bin balances of every item in the warehouses.
+    Balances are cached per warehouse for BALANCE_CACHE_TTL seconds, warehouses not cached are fetched in one query.
+    Use get_bin_balances where the balance must be current.
+    """
+    cache = frappe.cache()
+    balances = {}
+    missing = []
+    for warehouse in set(warehouses):
+        cached = cache.get_value(get_balance_cache_key(warehouse))
+        if cached is None:
+            missing.append(warehouse)
+        else:
+            balances[warehouse] = cached
+
+    if missing:
+        fetched = {warehouse: {} for warehouse in missing}
+        for item_bin in frappe.get_all(
+            "Merchandise Bin",
+            filters={"merchandise_warehouse": ["in", missing]},
+            fields=["merchandise_item_code", "merchandise_warehouse", "balance_quantity"]
+        ):
+            fetched[item_bin.merchandise_warehouse][item_bin.merchandise_item_code] = flt(item_bin.balance_quantity)
+
+        for warehouse, item_balances in fetched.items():
+            cache.set_value(get_balance_cache_key(warehouse), item_balances, expires_in_sec=BALANCE_CACHE_TTL)
+            balances[warehouse] = item_balances
+
+    return balances
+
+
+def clear_warehouse_balance_cache(warehouses):
+    """
+    Clears the cached balances of the warehouses and gives them a new stock version once the current
+    transaction commits.
+    """
+    warehouses = set(warehouses)
+
+    def clear_cache():
+        for warehouse in warehouses:
+            frappe.cache().delete_value(get_balance_cache_key(warehouse))
+            set_stock_version(warehouse)
+
+    frappe.db.after_commit.add(clear_cache)
+
+
+def get_stock_versions(warehouses):
+    """
+    Returns {warehouse: {"version": ..., "modified": ...}} identifying the current stock of each warehouse.
+    Versions live only in the cache, a warehouse without one gets a new version, so no database work is done.
+    """
+    cache = frappe.cache()
+    versions = {}
+    for warehouse in set(warehouses):
+        versions[warehouse] = cache.get_value(get_stock_version_key(warehouse)) or set_stock_version(warehouse)
+    return versions
+
+
+def set_stock_version(warehouse):
+    stock_version = {"version": frappe.generate_hash(length=12), "modified": datetime.now(timezone.utc).replace(microsecond=0)}
+    frappe.cache().set_value(get_stock_version_key(warehouse), stock_version)
+    return stock_version
+
+
+def get_balance_cache_key(warehouse):
+    return f"merchandise_warehouse_balances:{warehouse}"
+
+
+def get_stock_version_key(warehouse):
+    return f"merchandise_warehouse_stock_version:{warehouse}"
+
+
+def get_locked_bins(item_warehouse_pairs):
+    """
+    Locks the Merchandise Bin of every (item_code, warehouse) pair with SELECT ... FOR UPDATE and returns
+    {pair: bin} with the balances as of the lock. Bins are locked in name order so that concurrent
+    postings touching the same bins cannot deadlock, postings to other items proceed in parallel.
+    The locks are held until the transaction commits.
+    """
+    bin_names = make_bins(item_warehouse_pairs)
+    if not bin_names:
+        return {}
+
+    locked_bins = frappe.db.sql("""
+        SELECT name, merchandise_item_code, merchandise_warehouse, balance_quantity
+        FROM `tabMerchandise Bin`
+        WHERE name IN %(bin_names)s
+        ORDER BY name
+        FOR UPDATE
+    """, {"bin_names": tuple(sorted(bin_names.values()))}, as_dict=True)
+
+    return {(item_bin.merchandise_item_code, item_bin.merchandise_warehouse): item_bin for item_bin in locked_bins}
+
+
+def make_ledger_entries(ledger_rows):
+    """
+    Posts a batch of Merchandise Ledger rows.
+    The bins of all the rows are locked first, so running balances are computed from balances no other
+    posting can change until this transaction commits. The ledger rows are then bulk inserted and every
+    affected bin and warehouse is updated once. Each row is a dict of Merchandise Ledger fields, rows without
+    a name are hash named.
+    Returns the balance of every (item_code, warehouse) pair after posting.
+    """
+    if not ledger_rows:
+        return {}
+
+    locked_bins = get_locked_bins([
+        (row["merchandise_item_code"], row["merchandise_warehouse"]) for row in ledger_rows
+    ])
+    balances = {key: flt(item_bin.balance_quantity) for key, item_bin in locked_bins.items()}
+    net_quantities = defaultdict(float)
+    item_names = {}
+
+    # Rows posted before the latest row of their pair make the later balance_after values stale
+    latest_postings = get_latest_posting_datetimes(locked_bins)
+    repost_from = {}
+
+    timestamp = now()
+    user = frappe.session.user
+    values = []
+
+    # Ledger rows are hash named so postings to other bins do not wait on a naming series. Rows of the batch
+    # get increasing creation times, so they keep their posting order when sorted by posting_datetime and creation.
+    creation = get_datetime(timestamp)
+
+    for row_index, row in enumerate(ledger_rows):
+        key = (row["merchandise_item_code"], row["merchandise_warehouse"])
+        balances[key] += flt(row["quantity"])
+        net_quantities[key] += flt(row["quantity"])
+        item_names[row["merchandise_item_code"]] = row.get("merchandise_item_name")
+
+        posting_datetime = get_datetime(row["posting_datetime"])
+        if latest_postings.get(key) and posting_datetime < latest_postings[key]:
+            repost_from[key] = min(posting_datetime, repost_from.get(key, posting_datetime))
+
+        # Stock was validated before locking, check again now that the balance cannot change
+        if flt(row["quantity"]) < 0 and not row.get("is_cancelled") and balances[key] < 0:
+            frappe.throw(_(
+                "Insufficient stock for {0} in {1}. Available: {2}, Required: {3}"
+            ).format(
+                row.get("merchandise_item_name") or key[0], key[1],
+                balances[key] - flt(row["quantity"]), -flt(row["quantity"])
+            ))
+
+        ledger_entry = dict(row, balance_after=balances[key])
+        row_creation = creation + timedelta(microseconds=row_index)
+        values.append([row.get("name") or frappe.generate_hash(length=10), row_creation, row_creation, user, user, 0, 0]
+            + [ledger_entry.get(field) for field in LEDGER_FIELDS])
+
+    frappe.db.bulk_insert(
+        "Merchandise Ledger",
+        ["name", "creation", "modified", "owner", "modified_by", "docstatus", "idx"] + LEDGER_FIELDS,
+        values
+    )
+
+    for key, qty in net_quantities.items():
+        frappe.db.sql("""
+            UPDATE `tabMerchandise Bin`
+            SET balance_quantity = balance_quantity + %s, modified = %s
+            WHERE name = %s
+        """, (qty, timestamp, locked_bins[key].name))
+
+    update_warehouse_balances({key: balances[key] for key in net_quantities}, item_names)
+    clear_warehouse_balance_cache(warehouse for item_code, warehouse in net_quantities)
+
+    if repost_from:
+        queue_backdated_reposts(repost_from, item_names, ledger_rows[0].get("reference_doc_name"))
+
+    return balances
+
+
+def get_latest_posting_datetimes(item_warehouse_pairs):
+    """
+    Returns {(item_code, warehouse): posting_datetime} of the latest Merchandise Ledger row of each pair.
+    The transaction's snapshot is usually taken before the bins are locked, so the rows are read with a locking
+    read to see rows committed by postings that held the bin locks first.
+    """
+    pairs = set(item_warehouse_pairs)
+    if not pairs:
+        return {}
+
+    latest_postings = frappe.db.sql("""
+        SELECT merchandise_item_code, merchandise_warehouse, MAX(posting_datetime)
+        FROM `tabMerchandise Ledger`
+        WHERE merchandise_item_code IN %(item_codes)s AND merchandise_warehouse IN %(warehouses)s
+        GROUP BY merchandise_item_code, merchandise_warehouse
+        LOCK IN SHARE MODE
+    """, {
+        "item_codes": tuple({item_code for item_code, warehouse in pairs}),
+        "warehouses": tuple({warehouse for item_code, warehouse in pairs})
+    })
+    return {
+        (item_code, warehouse): get_datetime(posting_datetime)
+        for item_code, warehouse, posting_datetime in latest_postings
+        if (item_code, warehouse) in pairs and posting_datetime
+    }
+
+
+def queue_backdated_reposts(repost_from, item_names, reference_doc_name=None):
+    """
+    Queues a Merchandise Ledger Repost for each (item_code, warehouse) in {pair: posting_datetime} and enqueues
+    the repost job. A pair keeps one queued repost, moved to the earliest point. Callers hold the bin locks of
+    the pairs, so no other posting can queue a repost for them concurrently. A repost that was running while
+    the caller waited for the bin lock still reads as Queued in the caller's snapshot, so the queued reposts
+    are read with a locking read, which sees the repost as Completed once it has committed.
+    """
+    queued_reposts = {
+        (repost.merchandise_item_code, repost.merchandise_warehouse): repost for repost in frappe.get_all(
+            "Merchandise Ledger Repost",
+            filters={
+                "status": "Queued",
+                "merchandise_item_code": ["in", list({item_code for item_code, warehouse in repost_from})],
+                "merchandise_warehouse": ["in", list({warehouse for item_code, warehouse in repost_from})]
+            },
+            fields=["name", "merchandise_item_code", "merchandise_warehouse", "posting_datetime"],
+            for_update=True
+        )
+    }
+
+    for (item_code, warehouse), posting_datetime in repost_from.items():
+        queued_repost = queued_reposts.get((item_code, warehouse))
+        if queued_repost:
+            if posting_datetime < get_datetime(queued_repost.posting_datetime):
+                frappe.db.set_value("Merchandise Ledger Repost", queued_repost.name, "posting_datetime", posting_datetime)
+            continue
+
+        frappe.get_doc({
+            "doctype": "Merchandise Ledger Repost",
+            "merchandise_item_code": item_code,
+            "merchandise_item_name": item_names.get(item_code),
+            "merchandise_warehouse": warehouse,
+            "posting_datetime": posting_datetime,
+            "reference_doc_name": reference_doc_name,
+            "status": "Queued"
+        }).insert(ignore_permissions=True)
+
+    frappe.enqueue(
+        "colorapp.merchandise.repost.process_repost_queue",
+        queue="long",
+        timeout=3600,
+        job_id="merchandise_ledger_repost",
+        deduplicate=True,
+        enqueue_after_commit=True
+    )
+
+
+def update_warehouse_balances(balances, item_names):
+    """
+    Sets the Warehouse Merchandise Detail balances of the Merchandise Warehouses to the bin balances after posting.
+    The child rows of the posted items are read and updated by warehouse and item, so the cost does not depend
+    on how many items a warehouse carries, and the Merchandise Warehouse itself is never saved, so concurrent
+    postings to the same warehouse do not conflict on the warehouse document. Callers hold the bin locks of the pairs.
+    """
+    balances_by_warehouse = defaultdict(dict)
+    for (item_code, warehouse), balance in balances.items():
+        balances_by_warehouse[warehouse][item_code] = balance
+
+    for warehouse, item_balances in balances_by_warehouse.items():
+        detail_filters = {
+            "parent": warehouse,
+            "parenttype": "Merchandise Warehouse",
+            "parentfield": "merchandise_warehouse_item",
+            "merchandise_item_code": ["in", list(item_balances)]
+        }
+
+        # The locking read below takes gap locks where rows are missing, and two postings inserting rows into
+        # those gaps would deadlock. Postings that may insert rows lock the warehouse first, so only one of
+        # them holds such gap locks at a time, postings that only update rows do not wait for each other.
+        existing_items = set(frappe.get_all("Warehouse Merchandise Detail", filters=detail_filters, pluck="merchandise_item_code"))
+        warehouse_locked = any(item_code not in existing_items and balance > 0 for item_code, balance in item_balances.items())
+        if warehouse_locked:
+            lock_warehouse(warehouse)
+
+        # Locking read so rows added by postings committed after this transaction started are seen
+        details = frappe.get_all(
+            "Warehouse Merchandise Detail",
+            filters=detail_filters,
+            fields=["name", "merchandise_item_code"],
+            for_update=True
+        )
+
+        # Update all the existing rows of the warehouse in one statement
+        updated = {detail.name: item_balances[detail.merchandise_item_code] for detail in details}
+        if updated:
+            frappe.db.sql("""
+                UPDATE `tabWarehouse Merchandise Detail`
+                SET balance_quantity = CASE name {cases} END
+                WHERE name IN %(names)s
+            """.format(cases=" ".join(f"WHEN %(name_{i})s THEN %(balance_{i})s" for i in range(len(updated)))), dict(
+                {f"name_{i}": name for i, name in enumerate(updated)},
+                **{f"balance_{i}": balance for i, balance in enumerate(updated.values())},
+                names=tuple(updated)
+            ))
+
+        existing_items = {detail.merchandise_item_code for detail in details}
+        new_items = [item_code for item_code, balance in item_balances.items() if item_code not in existing_items and balance > 0]
+        if not new_items:
+            continue
+        if not warehouse_locked:
+            lock_warehouse(warehouse)
+
+        last_idx = frappe.db.sql("""
+            SELECT IFNULL(MAX(idx), 0) FROM `tabWarehouse Merchandise Detail`
+            WHERE parent = %s AND parenttype = 'Merchandise Warehouse' AND parentfield = 'merchandise_warehouse_item'
+            FOR UPDATE
+        """, warehouse)[0][0]
+        for idx, item_code in enumerate(new_items, start=last_idx + 1):
+            frappe.get_doc({
+                "doctype": "Warehouse Merchandise Detail",
+                "parent": warehouse,
+                "parenttype": "Merchandise Warehouse",
+                "parentfield": "merchandise_warehouse_item",
+                "idx": idx,
+                "merchandise_item_code": item_code,
+                "merchandise_item_name": item_names.get(item_code),
+                "balance_quantity": item_balances[item_code]
+            }).db_insert()
+
+
+def lock_warehouse(warehouse):
+    """
+    Locks the Merchandise Warehouse row, which serialises adding item rows to the warehouse.
+    """
+    frappe.db.sql("SELECT name FROM `tabMerchandise Warehouse` WHERE name = %s FOR UPDATE", warehouse)
+
+
+@frappe.whitelist()
+def rebuild_merchandise_bins():
+    """
+    Recomputes every Merchandise Bin from the latest period closing and the Merchandise Ledger rows after it,
+    and sets the Warehouse Merchandise Detail balances and caches to match. All the bins are locked before the
+    ledger is read, and the ledger is read with a locking read, so postings committed before the locks were
+    taken are included and later postings wait for the rebuild. Bins are moved by the difference to the
+    balance read under the lock.
+    """
+    frappe.only_for("System Manager")
+
+    existing_bins = frappe.db.sql("""
+        SELECT name, merchandise_item_code, merchandise_warehouse, balance_quantity
+        FROM `tabMerchandise Bin`
+        ORDER BY name
+        FOR UPDATE
+    """, as_dict=True)
+    locked_bins = {(item_bin.merchandise_item_code, item_bin.merchandise_warehouse): item_bin for item_bin in existing_bins}
+
+    balances = {pair: 0.0 for pair in locked_bins}
+    balances.update(get_ledger_balances(lock=True))
+
+    # Pairs posted without a bin yet get one, locked like the others
+    locked_bins.update(get_locked_bins(set(balances) - set(locked_bins)))
+
+    timestamp = now()
+    for key, balance in balances.items():
+        difference = flt(balance) - flt(locked_bins[key].balance_quantity)
+        if not difference:
+            continue
+        frappe.db.sql("""
+            UPDATE `tabMerchandise Bin`
+            SET balance_quantity = balance_quantity + %s, modified = %s
+            WHERE name = %s
+        """, (difference, timestamp, locked_bins[key].name))
+
+    item_names = dict(frappe.get_all("Merchandise Item", fields=["name", "merchandise_item_name"], as_list=True))
+    update_warehouse_balances(balances, item_names)
+    clear_warehouse_balance_cache(warehouse for item_code, warehouse in balances)
@@ -0,0 +1,9 @@
+# Copyright (c) 2024, Victor Mandela and contributors
+# For license information, please see license.txt
+
+from colorapp.indexes import create_indexes
+
+
+def execute():
+    # Create the managed indexes on existing sites
+    create_indexes()
@@ -0,0 +1,9 @@
+# Copyright (c) 2024, Victor Mandela and contributors
+# For license information, please see license.txt
+
+from colorapp.merchandise.stock_ledger import rebuild_merchandise_bins
+
+
+def execute():
+    # Build the balance store from the existing ledger
+    rebuild_merchandise_bins()
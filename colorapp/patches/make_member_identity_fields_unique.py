@@ -0,0 +1,48 @@
+# Copyright (c) 2024, Victor Mandela and contributors
+# For license information, please see license.txt
+
+import frappe
+
+IDENTITY_FIELDS = ("mobile_number", "id_number", "tk_membership_number")
+
+# Non-unique indexes replaced by the unique indexes of the fields
+REPLACED_INDEXES = ("mobile_number_index", "id_number_index", "tk_membership_number_index")
+
+
+def execute():
+    # Unique indexes allow many NULLs but only one empty string, store missing values as NULL
+    for fieldname in IDENTITY_FIELDS:
+        frappe.db.sql(f"""
+            UPDATE `tabColour App Member` SET `{fieldname}` = NULL
+            WHERE TRIM(`{fieldname}`) = ''
+        """)
+
+    check_duplicate_identity_values()
+
+    for index_name in REPLACED_INDEXES:
+        if frappe.db.has_index("tabColour App Member", index_name):
+            frappe.db.sql_ddl(f"ALTER TABLE `tabColour App Member` DROP INDEX `{index_name}`")
+
+
+def check_duplicate_identity_values():
+    """
+    Stops the migration with the list of conflicting members if any identity field holds the same value on
+    more than one member, the unique indexes cannot be added until the duplicates are merged or corrected.
+    """
+    conflicts = []
+    for fieldname in IDENTITY_FIELDS:
+        for value, members in frappe.db.sql(f"""
+            SELECT `{fieldname}`, GROUP_CONCAT(CONCAT(name, ' (', IFNULL(member_name, ''), ')') ORDER BY creation SEPARATOR ', ')
+            FROM `tabColour App Member`
+            WHERE `{fieldname}` IS NOT NULL
+            GROUP BY `{fieldname}`
+            HAVING COUNT(*) > 1
+        """):
+            conflicts.append(f"{frappe.unscrub(fieldname)} {value}: {members}")
+
+    if conflicts:
+        frappe.throw(
+            "Colour App Members share identity values that must be unique. "
+            "Merge or correct these members and run the migration again:<br>" + "<br>".join(conflicts),
+            title="Duplicate Colour App Members"
+        )
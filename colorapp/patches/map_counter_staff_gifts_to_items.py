@@ -0,0 +1,40 @@
+# Copyright (c) 2024, Victor Mandela and contributors
+# For license information, please see license.txt
+
+import frappe
+
+GIFT_FIELDS = {"gift_one": "Gift One", "gift_two": "Gift Two"}
+
+
+def execute():
+    """
+    Gift One and Gift Two of Counter Staff Meet Attendance Detail were free text and now link to Merchandise Item.
+    Values matching one item code or item name are set to the item code. Other values are kept in Gift Remarks
+    and cleared from the link field, so drafts can be saved again and the gift notes are not lost.
+    """
+    item_codes = {}
+    for item in frappe.get_all("Merchandise Item", fields=["name", "merchandise_item_name"]):
+        item_codes.setdefault(item.name.strip().lower(), set()).add(item.name)
+        if item.merchandise_item_name:
+            item_codes.setdefault(item.merchandise_item_name.strip().lower(), set()).add(item.name)
+
+    for fieldname, label in GIFT_FIELDS.items():
+        rows = frappe.db.sql(f"""
+            SELECT detail.name, detail.`{fieldname}` AS gift, detail.gift_remarks
+            FROM `tabCounter Staff Meet Attendance Detail` detail
+            LEFT JOIN `tabMerchandise Item` item ON item.name = detail.`{fieldname}`
+            WHERE IFNULL(detail.`{fieldname}`, '') != '' AND item.name IS NULL
+        """, as_dict=True)
+
+        for row in rows:
+            matches = item_codes.get(row.gift.strip().lower(), set())
+            if len(matches) == 1:
+                frappe.db.set_value("Counter Staff Meet Attendance Detail", row.name, fieldname,
+                    matches.pop(), update_modified=False)
+                continue
+
+            remarks = "\n".join(filter(None, [row.gift_remarks, f"{label}: {row.gift}"]))
+            frappe.db.set_value("Counter Staff Meet Attendance Detail", row.name, {
+                fieldname: None,
+                "gift_remarks": remarks
+            }, update_modified=False)
@@ -0,0 +1,33 @@
+# Copyright (c) 2024, Victor Mandela and Contributors
+# See license.txt
+
+from frappe.tests.utils import FrappeTestCase
+from colorapp.member_numbers import HALF_SIZE, NUMBER_COUNT, ROUNDS, feistel, permute, round_function
+
+
+def inverse_feistel(value):
+	left, right = divmod(value, HALF_SIZE)
+	for round_number in reversed(range(ROUNDS)):
+		left, right = (right - round_function(round_number, left)) % HALF_SIZE, left
+	return left * HALF_SIZE + right
+
+
+class TestMemberNumbers(FrappeTestCase):
+	def test_feistel_is_invertible(self):
+		for value in list(range(1000)) + [NUMBER_COUNT - 1, NUMBER_COUNT, HALF_SIZE ** 2 - 1]:
+			self.assertEqual(inverse_feistel(feistel(value)), value)
+
+	def test_permute_stays_in_range(self):
+		for position in list(range(1000)) + list(range(NUMBER_COUNT - 1000, NUMBER_COUNT)):
+			self.assertTrue(0 <= permute(position) < NUMBER_COUNT)
+
+	def test_permute_has_no_collisions(self):
+		positions = range(100000)
+		self.assertEqual(len({permute(position) for position in positions}), len(positions))
+
+	def test_issued_numbers_do_not_change(self):
+		# Changing the permutation would reissue numbers already given to members
+		self.assertEqual(
+			[permute(position) for position in (0, 1, 2, 12345, NUMBER_COUNT - 1)],
+			[26106069, 27509924, 62613305, 50217946, 39017922]
+		)
@@ -0,0 +1,126 @@
+# Copyright (c) 2024, Victor Mandela and Contributors
+# See license.txt
+
+import frappe
+from frappe.utils import get_datetime, now
+
+ENTRY_TYPES = ("Merchandise Receipt", "Merchandise Issue", "Merchandise Transfer")
+
+
+def make_merchandise_item(minimum_stock_level=0):
+	"""
+	Returns the code of a new Merchandise Item, each test gets its own item so balances do not mix.
+	"""
+	item_code = f"_Test Item {frappe.generate_hash(length=8)}"
+	frappe.get_doc({
+		"doctype": "Merchandise Item",
+		"merchandise_item_code": item_code,
+		"merchandise_item_name": item_code,
+		"maintain_stock": 1,
+		"minimum_stock_level": minimum_stock_level
+	}).insert(ignore_permissions=True)
+	return item_code
+
+
+def make_merchandise_warehouse():
+	warehouse = f"_Test Warehouse {frappe.generate_hash(length=8)}"
+	frappe.get_doc({
+		"doctype": "Merchandise Warehouse",
+		"merchandise_warehouse_code": warehouse,
+		"merchandise_warehouse_name": warehouse,
+		"merchandise_warehouse_type": "Main Warehouse"
+	}).insert(ignore_permissions=True)
+	return warehouse
+
+
+def make_merchandise_entry(entry_type, item_code, quantity, source_warehouse=None, target_warehouse=None,
+		posting_date=None, posting_time=None, submit=True):
+	for entry_type_name in ENTRY_TYPES:
+		if not frappe.db.exists("Merchandise Entry Type", entry_type_name):
+			frappe.get_doc({
+				"doctype": "Merchandise Entry Type",
+				"merchandise_entry_type_name": entry_type_name,
+				"merchandise_entry_type": entry_type_name
+			}).insert(ignore_permissions=True)
+
+	entry = frappe.get_doc({
+		"doctype": "Merchandise Entry",
+		"merchandise_entry_type": entry_type,
+		"source_warehouse": source_warehouse,
+		"target_warehouse": target_warehouse,
+		"posting_date": posting_date,
+		"posting_time": posting_time,
+		"merchandise_items": [{"merchandise_item_code": item_code, "quantity": quantity}]
+	})
+	entry.insert(ignore_permissions=True)
+	if submit:
+		entry.submit()
+	return entry
+
+
+def get_ledger_balances_after(item_code, warehouse):
+	"""
+	Returns balance_after of the ledger rows of the item and warehouse in posting order.
+	"""
+	return [
+		row.balance_after for row in frappe.get_all(
+			"Merchandise Ledger",
+			filters={"merchandise_item_code": item_code, "merchandise_warehouse": warehouse},
+			fields=["balance_after"],
+			order_by="posting_datetime, creation, name"
+		)
+	]
+
+
+def get_second_connection():
+	"""
+	Returns a separate database connection, used to commit a posting while the test transaction is open.
+	"""
+	db = frappe.database.get_db(
+		host=frappe.conf.db_host,
+		port=frappe.conf.db_port,
+		user=frappe.conf.db_user or frappe.conf.db_name,
+		password=frappe.conf.db_password,
+		cur_db_name=frappe.conf.db_name
+	)
+	db.connect()
+	return db
+
+
+def commit_ledger_row(db, item_code, warehouse, quantity, posting_datetime):
+	"""
+	Posts one ledger row on the given connection the way a concurrent posting does, under the bin lock, and commits.
+	"""
+	posting_datetime = get_datetime(posting_datetime)
+	bin_name, balance = db.sql("""
+		SELECT name, balance_quantity FROM `tabMerchandise Bin`
+		WHERE merchandise_item_code = %s AND merchandise_warehouse = %s
+		FOR UPDATE
+	""", (item_code, warehouse))[0]
+	timestamp = now()
+	db.sql("""
+		INSERT INTO `tabMerchandise Ledger` (name, creation, modified, owner, modified_by, merchandise_item_code,
+			merchandise_item_name, merchandise_warehouse, posting_date, posting_time, posting_datetime, quantity,
+			balance_after, transaction_type, is_cancelled)
+		VALUES (%s, %s, %s, 'Administrator', 'Administrator', %s, %s, %s, %s, %s, %s, %s, %s, 'Merchandise Receipt', 0)
+	""", (frappe.generate_hash(length=10), timestamp, timestamp, item_code, item_code, warehouse,
+		posting_datetime.date(), posting_datetime.time(), posting_datetime, quantity, balance + quantity))
+	db.sql("UPDATE `tabMerchandise Bin` SET balance_quantity = balance_quantity + %s WHERE name = %s", (quantity, bin_name))
+	db.commit()
+
+
+def delete_committed_stock(item_code, warehouse):
+	"""
+	Removes the committed test data of an item and warehouse, for tests that commit to simulate concurrent postings.
+	"""
+	frappe.db.rollback()
+	entries = frappe.get_all("Merchandise Entry Detail", filters={"merchandise_item_code": item_code}, pluck="parent")
+	if entries:
+		frappe.db.delete("Merchandise Entry Detail", {"parent": ["in", entries]})
+		frappe.db.delete("Merchandise Entry", {"name": ["in", entries]})
+	for doctype in ("Merchandise Ledger", "Merchandise Bin", "Merchandise Ledger Repost", "Merchandise Stock Alert"):
+		frappe.db.delete(doctype, {"merchandise_item_code": item_code, "merchandise_warehouse": warehouse})
+	frappe.db.delete("Warehouse Merchandise Detail", {"parent": warehouse})
+	frappe.db.delete("Merchandise Warehouse", {"name": warehouse})
+	frappe.db.delete("Merchandise Item", {"name": item_code})
+	frappe.db.commit()